@@ -48,7 +48,8 @@ export default function EmpDialog({
     if (!validateForm()) return;
 
     try {
-      if (!emp.avatar || !emp.avatar.startsWith("data:image/")) {
+      // Avatars are either a new Base64 image or the url of the stored one.
+      if (!emp.avatar || !(emp.avatar.startsWith("data:image/") || emp.avatar.includes("/api/v1/images/"))) {
         setAlert({
           message: "Avatar must be a valid Base64-encoded image.",
           severity: "error",
@@ -55,7 +55,8 @@ export default function EmployeeTable() {
 
   const fetchEmployees = async () => {
     try {
-      const response = await axios.get("http://127.0.0.1:5000/api/v1/staff");
+      // Avatars are left out of the default view
+      const response = await axios.get("http://127.0.0.1:5000/api/v1/staff", { params: { fields: "*" } });
       const mappedRows = response.data.map((row) => ({ ...row, id: row._id })); 
       setRows(mappedRows);
     } catch (error) {
@@ -74,7 +75,6 @@ export default function EmployeeTable() {
         id: index + 1,
         name: user.name,
         username: user.username,
-        password: user.password,
         userType: user.userType, 
       }));
       
@@ -107,7 +107,8 @@ const handleEmp = async ({ action, employee }) => {
         const completeEmployeeData = {
           ...employee,
           username: userData?.username || "",
-          password: userData?.password || "",
+          // Passwords are never returned, a new one must be typed to save the user
+          password: "",
           userType: userData?.userType || ""
         };
         
@@ -285,7 +286,6 @@ const handleSave = async (newEmployee) => {
     { field: "id", headerName: "ID", flex: 1 },
     { field: "name", headerName: "Name", flex: 2 },
     { field: "username", headerName: "Username", flex: 2 },
-    { field: "password", headerName: "Password", flex: 2 },
     { field: "userType", headerName: "Type", flex: 1 }, 
   ];
   
@@ -161,7 +161,8 @@ export default function Inventory() {
     const fetchInventories = async () => {
         // API request
         try {
-            const response = await axios.get(INVENTORIES_API)
+            // The list shows the images, which are left out of the default view
+            const response = await axios.get(INVENTORIES_API, { params: { fields: "*" } })
             setRows(response.data)
             console.log(response.data)
         }
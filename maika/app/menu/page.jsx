@@ -116,7 +116,8 @@ const [alert, setAlert] = useState({
   const fetchMeals = async () => {
       // API request
       try {
-          const response = await axios.get(MENU_API)
+          // The list shows the images, which are left out of the default view
+          const response = await axios.get(MENU_API, { params: { fields: "*" } })
           setRows(response.data)
           console.log(response.data)
       }
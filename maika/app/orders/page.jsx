@@ -81,7 +81,7 @@ export default function App() {
     const fetchMenu = async () => {
       setLoading(true);
       try {
-        const response = await axios.get("http://localhost:5000/menu-api/v1/menus");
+        const response = await axios.get("http://localhost:5000/menu-api/v1/menus", { params: { fields: "*" } });
         setMenuItems(response.data);
       } catch (err) {
         setError("Error al obtener el menú: " + err.message);
@@ -1,7 +1,12 @@
 /** @type {import('next').NextConfig} */
+const apiUrl = process.env.MAIKA_API_URL || "http://localhost:5000";
+
 const nextConfig = {
   output: "standalone",
-  
+  // Images are stored by path and served by the API image store.
+  async rewrites() {
+    return [{ source: "/api/v1/images/:hash", destination: `${apiUrl}/api/v1/images/:hash` }];
+  },
 };
 
-export default nextConfig;
\ No newline at end of file
+export default nextConfig;
@@ -1,33 +1,38 @@
-from flask import Flask
+import os
+from flask import Flask, request
 from flask_cors import CORS
-from models.menu_model import MenuModel
+from logger.access_logger import AccessLogger
+from schemas.json_provider import FastJSONProvider
+from services.metrics_service import MetricsService
+from routes.metrics_routes import MetricsRoutes
+from models.database_model import DatabaseModel
+from services.sequence_service import SequenceService
+from services.image_service import ImageService
+from routes.image_routes import ImageRoutes
 from services.menu_services import MenuService
 from schemas.menu_schemas import MenuSchema
 from routes.menu_routes import MenuRoutes
-from models.reservation_model import ReservationModel
 from services.reservation_service import ReservationService
+from services.slot_service import ReservationSlotService
 from schemas.reservation_schemas import ReservationSchema
 from routes.reservation_routes import ReservationRoute
-from models.staff_model import StaffModel
 from services.staff_service import StaffService
 from schemas.staff_schema import StaffSchema
 from routes.staff_routes import StaffRoutes
-from models.inventory_model import InventoryModel
 from services.inventory_service import InventoryService
 from schemas.inventory_schema import InventorySchema
 from routes.inventory_routes import InventoryRoutes
-from models.payment_model import PaymentModel
 from services.payment_services import PaymentService
 from schemas.payment_schemas import PaymentSchema
 from routes.payment_route import PaymentRoutes
-from models.order_model import OrderModel
 from services.order_service import OrderService
+from services.order_feed import OrderFeed
+from services.idempotency_service import IdempotencyService
 from schemas.order_schemas import OrderSchema
 from routes.order_route import OrderRoutes
 from routes.healthcheck_routes import HealthcheckRoutes
 
 # Authentication imports
-from models.user_model import UserModel
 from services.user_service import UserService
 from schemas.user_schema import UserSchema
 from routes.user_routes import UserRoutes
@@ -35,105 +40,108 @@ from routes.user_routes import UserRoutes
 from flasgger import Swagger
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+
+# Request ids, timings and one JSON access record per request
+access_logger = AccessLogger(app)
+
+# Prometheus metrics per route and MongoDB command
+metrics_service = MetricsService(app)
 
 # CORS configuration for authentication
 CORS(app, 
      origins=["http://localhost:3000"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-     allow_headers=["Content-Type", "Authorization"],
+     allow_headers=["Content-Type", "Authorization", "Idempotency-Key"],
+     expose_headers=["X-Sync-Token"],
      supports_credentials=True)
 
 # Swagger configuration
 swagger = Swagger(app)
 
+# Shared database connection, the pooled client is created lazily in each worker
+db_conn = DatabaseModel()
+db_conn.connect_to_database()
+db_conn.command_monitor.observers.append(metrics_service.observe_command)
+sequence_service = SequenceService(db_conn)
+image_service = ImageService(db_conn)
+idempotency_service = IdempotencyService(db_conn)
+
 # Authentication setup
-db_conn_user = UserModel()
-db_conn_user.connect_to_database()
-user_service = UserService(db_conn_user)
+user_service = UserService(db_conn, sequence_service)
 user_schema = UserSchema()
 user_routes = UserRoutes(user_service, user_schema)
 app.register_blueprint(user_routes)
 
 # Menu
-db_conn_menu = MenuModel()
-db_conn_menu.connect_to_database()
-menu_service = MenuService(db_conn_menu)
+menu_service = MenuService(db_conn, sequence_service, image_service)
 menu_schema = MenuSchema()
 menu_routes = MenuRoutes(menu_service, menu_schema)
 app.register_blueprint(menu_routes)
 
 # Reservations
-db_conn_reservation = ReservationModel()
-db_conn_reservation.connect_to_database()
-reservation_service = ReservationService(db_conn_reservation)
+slot_service = ReservationSlotService(db_conn)
+reservation_service = ReservationService(db_conn, sequence_service, slot_service)
 reservation_schema = ReservationSchema()
 reservation_routes = ReservationRoute(reservation_service, reservation_schema)
 app.register_blueprint(reservation_routes)
 
 # Staff
-db_conn_staff = StaffModel()
-db_conn_staff.connect_to_database()
-staff_service = StaffService(db_conn_staff)
+staff_service = StaffService(db_conn, sequence_service, image_service)
 staff_schema = StaffSchema()
 staff_routes = StaffRoutes(staff_service, staff_schema)
 app.register_blueprint(staff_routes)
 
 # Inventory
-db_conn_inventory = InventoryModel()
-db_conn_inventory.connect_to_database()
-inventory_service = InventoryService(db_conn_inventory)
+inventory_service = InventoryService(db_conn, sequence_service, image_service)
 inventory_schema = InventorySchema()
 inventory_routes = InventoryRoutes(inventory_service, inventory_schema)
 app.register_blueprint(inventory_routes)
 
 # Payment
-db_conn_payment = PaymentModel()
-db_conn_payment.connect_to_database()
-payment_service = PaymentService(db_conn_payment)
+payment_service = PaymentService(db_conn, sequence_service)
 payment_schema = PaymentSchema()
-payment_routes = PaymentRoutes(payment_service, payment_schema)
+payment_routes = PaymentRoutes(payment_service, payment_schema, idempotency_service)
 app.register_blueprint(payment_routes)
 
 # Order
-db_conn_order = OrderModel()
-db_conn_order.connect_to_database()
-order_service = OrderService(db_conn_order)
+order_service = OrderService(db_conn, sequence_service)
 order_schema = OrderSchema()
-order_routes = OrderRoutes(order_service, order_schema)
+order_feed = OrderFeed(db_conn)
+order_routes = OrderRoutes(order_service, order_schema, order_feed, idempotency_service)
 app.register_blueprint(order_routes)
 
+# Images
+image_routes = ImageRoutes(image_service)
+app.register_blueprint(image_routes)
+
 # Healthcheck
-healthcheck_routes = HealthcheckRoutes()
+healthcheck_routes = HealthcheckRoutes(db_conn)
 app.register_blueprint(healthcheck_routes)
 
+# Metrics
+metrics_routes = MetricsRoutes(metrics_service)
+app.register_blueprint(metrics_routes)
+
 # Add a simple route to test
 @app.route('/api/v1/test', methods=['GET'])
 def test_endpoint():
     return {'message': 'API is working', 'status': 'success'}
 
-# Add CORS preflight handler for all routes
+# Answering CORS preflights before the views, some routes list OPTIONS and would run for them.
+# flask-cors adds the headers from the configuration above, Idempotency-Key included
 @app.before_request
 def handle_preflight():
-    from flask import request
     if request.method == "OPTIONS":
-        from flask import make_response
-        response = make_response()
-        response.headers.add("Access-Control-Allow-Origin", "http://localhost:3000")
-        response.headers.add('Access-Control-Allow-Headers', "Content-Type,Authorization")
-        response.headers.add('Access-Control-Allow-Methods', "GET,PUT,POST,DELETE,OPTIONS")
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response
+        return app.make_default_options_response()
 
 if __name__ == '__main__':
     try:
+        # Under gunicorn the indexes are created once by the master, see gunicorn.conf.py
+        if os.environ.get('MONGODB_ENSURE_INDEXES', '1') == '1':
+            db_conn.ensure_indexes()
         print("Starting Flask application...")
         print(f"Registered blueprints: {[bp.name for bp in app.blueprints.values()]}")
         app.run(debug=True, host='0.0.0.0', port=5000)
     finally:
-        db_conn_inventory.close_connection()
-        db_conn_menu.close_connection()
-        db_conn_order.close_connection()
-        db_conn_payment.close_connection()
-        db_conn_reservation.close_connection()
-        db_conn_staff.close_connection()
-        db_conn_user.close_connection()
\ No newline at end of file
+        db_conn.close_connection()
@@ -0,0 +1,53 @@
+import itertools
+import os
+import shutil
+
+# Gunicorn server hooks, bind address and workers are set in the Dockerfile
+
+# Cooperative workers, an open order feed waits on a greenlet instead of holding a worker
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+
+# Starting with an empty metrics directory, files left by a previous run would be added to the new counts
+def on_starting(server):
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+# Creating the registered indexes once, before the workers start serving
+def when_ready(server):
+    if os.environ.get('MONGODB_ENSURE_INDEXES', '1') != '1':
+        return
+    from models.database_model import DatabaseModel
+
+    db_conn = DatabaseModel()
+    try:
+        db_conn.connect_to_database()
+        db_conn.ensure_indexes()
+    except Exception as e:
+        server.log.error(f'Error creating the indexes: {e}')
+    finally:
+        # The workers are forked after this hook, they must not inherit the client
+        db_conn.close_connection()
+
+
+# Numbering each worker with the lowest number free, a worker that replaces another takes over its log files
+def pre_fork(server, worker):
+    taken = {getattr(running, 'log_number', None) for running in server.WORKERS.values()}
+    worker.log_number = next(number for number in itertools.count(1) if number not in taken)
+
+
+# Each worker writes and rotates its own log files, maika_api-1.log, maika_access-1.log...
+def post_fork(server, worker):
+    from logger.logger_base import set_file_suffix
+    set_file_suffix(str(worker.log_number))
+
+
+# Dropping the live gauges of a worker that exited
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
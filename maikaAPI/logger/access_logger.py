@@ -0,0 +1,56 @@
+import json
+import time
+import uuid
+from flask import g, request
+from logger.logger_base import ACCESS_LOGGER, Logger, request_id_var
+
+
+# Request layer that tags every log line with a request id and writes one JSON access record per request
+class AccessLogger:
+    def __init__(self, app=None):
+        self.logger = Logger(name=ACCESS_LOGGER)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.teardown_request)
+
+    def start_request(self):
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_id = request_id
+        g.request_id_token = request_id_var.set(request_id)
+        g.request_started_at = time.perf_counter()
+        g.db_time = 0.0
+        g.db_commands = 0
+        g.serialize_time = 0.0
+
+    def finish_request(self, response):
+        if 'request_started_at' not in g:
+            return response
+
+        wall_time = time.perf_counter() - g.request_started_at
+        record = {
+            'request_id': g.request_id,
+            'method': request.method,
+            'path': request.path,
+            'route': request.url_rule.rule if request.url_rule else None,
+            'blueprint': request.blueprint,
+            'status': response.status_code,
+            'bytes': response.content_length,
+            'wall_ms': round(wall_time * 1000, 3),
+            'db_ms': round(g.db_time * 1000, 3),
+            'db_commands': g.db_commands,
+            'serialize_ms': round(g.serialize_time * 1000, 3),
+            'remote_addr': request.remote_addr
+        }
+        self.logger.info(json.dumps(record))
+        response.headers['X-Request-ID'] = g.request_id
+        response.headers['X-DB-Query-Count'] = str(g.db_commands)
+        return response
+
+    def teardown_request(self, exception=None):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id_var.reset(token)
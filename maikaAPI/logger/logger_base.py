@@ -1,17 +1,184 @@
+import atexit
+import contextvars
 import logging as log
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s: %(levelname)s [%(request_id)s] [%(filename)s:%(lineno)d] %(message)s'
+DATE_FORMAT = '%Y-%m-%d %I:%M:%S %p'
+
+# Access records are JSON lines written to their own file
+ACCESS_LOGGER = 'maika.access'
+
+# Id of the request being handled, attached to every record logged while it runs
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+# Process-wide pipeline: callers only enqueue records, a background thread does the I/O
+_queue_handler = None
+_listener = None
+_log_file = None
+# Each gunicorn worker writes its own files, so every file has a single writer that can rotate it
+_file_suffix = None
+_setup_lock = threading.Lock()
+
+
+class RateLimitFilter(log.Filter):
+    """Lets through at most `rate` records per second for each call site, warnings and above always pass"""
+
+    def __init__(self, rate, burst=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or rate
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        # One access record per request is always kept
+        if self.rate <= 0 or record.levelno >= log.WARNING or record.name == ACCESS_LOGGER:
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated_at, suppressed = self.buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self.buckets[key] = (tokens - 1, now, 0)
+
+        if suppressed:
+            record.msg = f'{record.getMessage()} ({suppressed} similar messages suppressed)'
+            record.args = None
+        return True
+
+
+class RequestIdFilter(log.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class LoggerNameFilter(log.Filter):
+    """Keeps the records of one logger, or drops them when exclude is set"""
+
+    def __init__(self, name, exclude=False):
+        super().__init__()
+        self.logger_name = name
+        self.exclude = exclude
+
+    def filter(self, record):
+        return (record.name == self.logger_name) != self.exclude
+
+
+def _file_handler(log_file):
+    if _file_suffix:
+        root, extension = os.path.splitext(log_file)
+        log_file = f'{root}-{_file_suffix}{extension}'
+    # Opened on the first record, a forked worker does not create files under the name of its parent
+    return RotatingFileHandler(
+        log_file,
+        maxBytes=int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+        backupCount=int(os.environ.get('LOG_BACKUP_COUNT', 5)),
+        delay=True
+    )
+
+
+def _build_handlers(log_file):
+    formatter = log.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+
+    file_handler = _file_handler(log_file)
+    stream_handler = log.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+        handler.addFilter(LoggerNameFilter(ACCESS_LOGGER, exclude=True))
+
+    access_handler = _file_handler(os.environ.get('ACCESS_LOG_FILE', 'maika_access.log'))
+    access_handler.setFormatter(log.Formatter('%(message)s'))
+    access_handler.addFilter(LoggerNameFilter(ACCESS_LOGGER))
+    return [file_handler, stream_handler, access_handler]
+
+
+def _start_listener():
+    global _listener
+
+    _listener = QueueListener(_queue_handler.queue, *_build_handlers(_log_file), respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive a fork, the child starts its own on a fresh queue
+    global _setup_lock
+
+    _setup_lock = threading.Lock()
+    if _queue_handler is None:
+        return
+    _queue_handler.queue = queue.Queue(-1)
+    _start_listener()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def set_file_suffix(suffix):
+    """Writes the log files of this process as <name>-<suffix>.log, called by each gunicorn worker after the fork"""
+    global _file_suffix
+
+    with _setup_lock:
+        _file_suffix = suffix
+        if _queue_handler is None:
+            return
+        _listener.stop()
+        _start_listener()
+
+
+def _parse_levels(value):
+    # LOG_LEVELS="routes=WARNING,services.order_service=DEBUG"
+    levels = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _configure(log_file, level):
+    global _queue_handler, _log_file
+
+    with _setup_lock:
+        if _queue_handler is not None:
+            return
+
+        _queue_handler = QueueHandler(queue.Queue(-1))
+        _queue_handler.addFilter(RequestIdFilter())
+        _queue_handler.addFilter(RateLimitFilter(float(os.environ.get('LOG_RATE_LIMIT', 20))))
+
+        root = log.getLogger()
+        root.setLevel(os.environ.get('LOG_LEVEL', log.getLevelName(level)).upper())
+        root.addHandler(_queue_handler)
+        for name, logger_level in _parse_levels(os.environ.get('LOG_LEVELS', '')).items():
+            log.getLogger(name).setLevel(logger_level)
+
+        _log_file = log_file
+        _start_listener()
+        atexit.register(_stop_listener)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_after_fork)
+
 
 class Logger:
-    def __init__(self, log_file='maika_api.log', level=log.INFO):
-        log.basicConfig(
-            level=level,
-            format='%(asctime)s: %(levelname)s [%(filename)s:%(lineno)d] %(message)s',
-            datefmt='%Y-%m-%d %I:%M:%S %p',
-            handlers=[
-                log.FileHandler(log_file),
-                log.StreamHandler()
-            ]
-        )
-        self.logger = log.getLogger()
+    def __init__(self, log_file='maika_api.log', level=log.INFO, name=None):
+        _configure(log_file, level)
+        # Named after the calling module, so LOG_LEVELS can tune each package or module
+        if name is None:
+            name = sys._getframe(1).f_globals.get('__name__', 'maika')
+        self.logger = log.getLogger(name)
 
     def debug(self, message):
         self.logger.debug(message, stacklevel=2)
@@ -27,5 +194,3 @@ class Logger:
 
     def critical(self, message):
         self.logger.critical(message, stacklevel=2)
-
-
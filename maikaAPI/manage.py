@@ -0,0 +1,221 @@
+import argparse
+import base64
+import os
+import time
+from datetime import date, datetime
+from models.database_model import DatabaseModel
+from services.image_service import ImageService
+from services.reservation_service import ReservationService
+from services.slot_service import ReservationSlotService
+
+# Collections and fields that used to store base-64 images inline
+INLINE_IMAGE_FIELDS = [
+    ('inventories', 'image'),
+    ('menu', 'image'),
+    ('staff', 'avatar')
+]
+
+
+# Moving the inline base-64 images into the image store, absolute image urls are turned into paths
+def migrate_images(db_conn, args):
+    image_service = ImageService(db_conn)
+    for collection, field in INLINE_IMAGE_FIELDS:
+        migrated = image_service.migrate_inline_images(collection, field, args.batch_size)
+        print(f'{collection}: {migrated} images moved to the image store')
+
+
+# Storing date_at on the reservations saved with only the display date
+def backfill_reservation_dates(db_conn, args):
+    reservation_service = ReservationService(db_conn, sequence_service=None, slot_service=None)
+    updated = reservation_service.backfill_dates(args.batch_size)
+    print(f'reservations: {updated} dates backfilled')
+
+
+# Recomputing the slot counters of some days from the stored reservations
+def rebuild_reservation_slots(db_conn, args):
+    slot_service = ReservationSlotService(db_conn)
+    rebuilt = slot_service.rebuild_days(args.date, args.days)
+    print(f'reservation_slots: {rebuilt} days rebuilt from {args.date}')
+
+
+# Creating the registered indexes of every collection
+def ensure_indexes(db_conn, args):
+    created = db_conn.ensure_indexes()
+    for collection, names in created.items():
+        print(f'{collection}: {", ".join(names)}')
+    for collection, drift in db_conn.index_report().items():
+        print(f'{collection}: missing {drift["missing"]}, extra {drift["extra"]}')
+
+
+# Realistic list responses: orders with their dishes and inventories with inline images
+def json_fixtures(documents):
+    image = 'data:image/png;base64,' + base64.b64encode(os.urandom(24 * 1024)).decode('ascii')
+    orders = [{
+        '_id': index,
+        'name': f'Customer {index}',
+        'table': index % 20,
+        'status': 'pending',
+        'time': datetime(2024, 11, 21, 14, 30),
+        'dishes': [{'_id': dish, 'name': f'Dish {dish}', 'price': 12.5, 'quantity': 2} for dish in range(8)]
+    } for index in range(documents)]
+    inventories = [{
+        '_id': index,
+        'name': f'Ingredient {index}',
+        'existence': 100,
+        'image': image
+    } for index in range(documents)]
+    return {'orders': orders, 'inventories': inventories}
+
+
+# Comparing the encode time of the standard library provider and the configured one
+def benchmark_json(db_conn, args):
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from schemas.json_provider import FastJSONProvider, bson_default, orjson
+
+    app = Flask(__name__)
+    providers = [('stdlib', DefaultJSONProvider(app)), ('orjson' if orjson else 'fallback', FastJSONProvider(app))]
+    for name, fixture in json_fixtures(args.documents).items():
+        for provider_name, provider in providers:
+            size = len(provider.dumps(fixture, default=bson_default))
+            started_at = time.perf_counter()
+            for _ in range(args.repeat):
+                provider.dumps(fixture, default=bson_default)
+            elapsed = (time.perf_counter() - started_at) / args.repeat
+            print(f'{name} {provider_name}: {elapsed * 1000:.2f} ms per encode, {size / elapsed / 1024 / 1024:.1f} MB/s')
+
+
+# The benchmarks that write refuse to run on the production database
+def require_scratch_database(db_conn, command):
+    if db_conn.database_name == 'microservices':
+        raise SystemExit(f'{command} replaces the orders of its database, use a scratch database')
+
+
+# Comparing the pending totals computed in Python with the aggregation pipeline, at each number of open orders
+def benchmark_pending(db_conn, args):
+    from services.payment_services import PaymentService
+
+    require_scratch_database(db_conn, 'benchmark-pending')
+    payment_service = PaymentService(db_conn, sequence_service=None)
+    db = db_conn.db
+
+    # The previous implementation, every order is read whole and summed in Python
+    def python_totals():
+        orders = list(db.orders.find())
+        for order in orders:
+            total = 0
+            for dish in order['dishes']:
+                total += dish['price'] * dish['quantity']
+            order['total'] = total
+        return orders
+
+    for count in args.orders:
+        db.orders.delete_many({})
+        fixtures = json_fixtures(count)['orders']
+        for order in fixtures:
+            order['_id'] += 1
+        for start in range(0, count, 5000):
+            db.orders.insert_many(fixtures[start:start + 5000])
+
+        for name, totals in [('python', python_totals), ('pipeline', payment_service.get_all_orders_to_pay)]:
+            started_at = time.perf_counter()
+            for _ in range(args.repeat):
+                orders = totals()
+            elapsed = (time.perf_counter() - started_at) / args.repeat
+            print(f'{count} orders {name}: {elapsed * 1000:.1f} ms per request, {len(orders)} orders')
+    db.orders.delete_many({})
+
+
+# Comparing the checkout throughput of the previous insert-then-delete path and the current one
+def benchmark_checkout(db_conn, args):
+    from services.payment_services import PaymentService
+    from services.sequence_service import SequenceService
+
+    require_scratch_database(db_conn, 'benchmark-checkout')
+    payment_service = PaymentService(db_conn, SequenceService(db_conn))
+    db = db_conn.db
+
+    def create_orders():
+        db.orders.delete_many({})
+        db.payments.delete_many({})
+        orders = [{
+            '_id': index + 1,
+            'name': f'Customer {index}',
+            'table': index % 20 + 1,
+            'status': 'pending',
+            'dishes': [{'name': f'Dish {dish}', 'price': 12.5, 'quantity': 2} for dish in range(4)]
+        } for index in range(args.orders)]
+        db.orders.insert_many(orders)
+        return orders
+
+    def payment_for(order):
+        return {'rfc': 'XAXX010101000', 'payment_type': 'cash', 'order_id': order['_id'], 'total': 100}
+
+    def legacy_checkout(order):
+        new_payment = payment_for(order)
+        new_payment['_id'] = payment_service.sequence_service.next_id('payments')
+        new_payment['active'] = True
+        db.payments.insert_one(new_payment)
+        db.orders.delete_one({'_id': order['_id']})
+
+    mode = 'transaction' if payment_service.supports_transactions() else 'claim'
+    for name, checkout in [('legacy', legacy_checkout), (mode, lambda order: payment_service.add_payment(payment_for(order)))]:
+        orders = create_orders()
+        started_at = time.perf_counter()
+        for order in orders:
+            checkout(order)
+        elapsed = time.perf_counter() - started_at
+        print(f'{name}: {len(orders) / elapsed:.1f} checkouts/s, {elapsed / len(orders) * 1000:.2f} ms per checkout')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maika API management commands')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    images_parser = subparsers.add_parser('migrate-images', help='Move inline base-64 images into the image store')
+    images_parser.add_argument('--batch-size', type=int, default=100)
+    images_parser.set_defaults(func=migrate_images)
+
+    slots_parser = subparsers.add_parser('rebuild-reservation-slots', help='Recompute the slot counters from the reservations')
+    slots_parser.add_argument('--date', type=date.fromisoformat, default=date.today(), help='First day, YYYY-MM-DD')
+    slots_parser.add_argument('--days', type=int, default=30)
+    slots_parser.set_defaults(func=rebuild_reservation_slots)
+
+    indexes_parser = subparsers.add_parser('ensure-indexes', help='Create the registered indexes and report the drift')
+    indexes_parser.set_defaults(func=ensure_indexes)
+
+    dates_parser = subparsers.add_parser('backfill-reservation-dates', help='Store the datetime of existing reservations')
+    dates_parser.add_argument('--batch-size', type=int, default=500)
+    dates_parser.set_defaults(func=backfill_reservation_dates)
+
+    benchmark_parser = subparsers.add_parser('benchmark-json', help='Compare the JSON encoders on realistic list responses')
+    benchmark_parser.add_argument('--documents', type=int, default=500)
+    benchmark_parser.add_argument('--repeat', type=int, default=20)
+    benchmark_parser.set_defaults(func=benchmark_json, database=False)
+
+    pending_parser = subparsers.add_parser('benchmark-pending', help='Compare the pending totals in Python and in the pipeline, replaces the orders of its database')
+    pending_parser.add_argument('--orders', type=int, nargs='+', default=[10000, 100000])
+    pending_parser.add_argument('--repeat', type=int, default=5)
+    pending_parser.add_argument('--database-name', default='maika_benchmark', help='Scratch database, never the production one')
+    pending_parser.set_defaults(func=benchmark_pending)
+
+    checkout_parser = subparsers.add_parser('benchmark-checkout', help='Compare the checkout throughput, clears the orders and payments of its database')
+    checkout_parser.add_argument('--orders', type=int, default=500)
+    checkout_parser.add_argument('--database-name', default='maika_benchmark', help='Scratch database, never the production one')
+    checkout_parser.set_defaults(func=benchmark_checkout)
+
+    args = parser.parse_args()
+    if not getattr(args, 'database', True):
+        args.func(None, args)
+        return
+
+    db_conn = DatabaseModel(getattr(args, 'database_name', 'microservices'))
+    db_conn.connect_to_database()
+    try:
+        args.func(db_conn, args)
+    finally:
+        db_conn.close_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+import bson
+from flask import g, has_request_context, request
+from pymongo import monitoring
+from logger.logger_base import Logger
+
+WRITE_COMMANDS = {'insert', 'update', 'delete', 'findAndModify'}
+
+
+# Commands seen while a recorder is active, used to check the round trips of a code path
+class QueryRecorder:
+    def __init__(self):
+        self.commands = []
+
+    @property
+    def count(self):
+        return len(self.commands)
+
+
+# Listener that records every MongoDB command: per-request stats, slow command log and recorders
+class CommandMonitor(monitoring.CommandListener):
+    def __init__(self, slow_query_ms=None):
+        self.logger = Logger()
+        self.slow_query_ms = slow_query_ms if slow_query_ms is not None else float(os.environ.get('MONGODB_SLOW_QUERY_MS', 100))
+        # Wall clock time of the last write acknowledged by the server in this process
+        self.last_write_at = None
+        # Succeeded and failed events do not carry the command, so the collection is kept from the start
+        self.collections = {}
+        self.recorders = []
+        # Called with (command, collection, seconds, outcome) for every command, e.g. the Prometheus metrics
+        self.observers = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def record(self):
+        recorder = QueryRecorder()
+        with self.lock:
+            self.recorders.append(recorder)
+        try:
+            yield recorder
+        finally:
+            with self.lock:
+                self.recorders.remove(recorder)
+
+    @contextmanager
+    def assert_max_queries(self, max_queries):
+        """Test helper, fails when the block issues more than max_queries database commands"""
+        with self.record() as recorder:
+            yield recorder
+        if recorder.count > max_queries:
+            commands = ', '.join(f"{command['command']} {command['collection']}" for command in recorder.commands)
+            raise AssertionError(f'Expected at most {max_queries} database commands, got {recorder.count}: {commands}')
+
+    def _record(self, event, outcome, reply=None):
+        with self.lock:
+            collection = self.collections.pop(event.request_id, '')
+            recorders = list(self.recorders)
+        duration_ms = event.duration_micros / 1000
+        for observer in self.observers:
+            observer(event.command_name, collection, duration_ms / 1000, outcome)
+
+        # Events are published on the thread that ran the command, so g is the request's
+        in_request = has_request_context()
+        if in_request and 'db_time' in g:
+            g.db_time += duration_ms / 1000
+            g.db_commands += 1
+
+        slow = duration_ms >= self.slow_query_ms
+        if not slow and not recorders:
+            return
+
+        # Encoding the reply has a cost, its size is only measured when someone reads it
+        command = {
+            'command': event.command_name,
+            'collection': collection,
+            'duration_ms': round(duration_ms, 3),
+            'reply_bytes': len(bson.encode(reply)) if reply is not None else None,
+            'route': f'{request.method} {request.url_rule.rule if request.url_rule else request.path}' if in_request else None
+        }
+        for recorder in recorders:
+            recorder.commands.append(command)
+        if slow:
+            self.logger.warning(
+                f"Slow MongoDB command {command['command']} on '{collection}': {command['duration_ms']} ms, "
+                f"{command['reply_bytes']} bytes, route {command['route']}"
+            )
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        with self.lock:
+            self.collections[event.request_id] = collection if isinstance(collection, str) else ''
+
+    def succeeded(self, event):
+        self._record(event, 'success', event.reply)
+        if event.command_name in WRITE_COMMANDS:
+            self.last_write_at = time.time()
+
+    def failed(self, event):
+        self._record(event, 'failure')
+
+
+# Listener that keeps the connection pool usage of this process
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+            self.checked_out = 0
+
+    def _add(self, connections=0, checked_out=0):
+        with self.lock:
+            self.connections = max(0, self.connections + connections)
+            self.checked_out = max(0, self.checked_out + checked_out)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(connections=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(connections=-1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        self._add(checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
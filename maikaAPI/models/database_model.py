@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+import pymongo
+from logger.logger_base import Logger
+from models.command_monitor import CommandMonitor, PoolMonitor
+from models.indexes import INDEXES
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
+
+# One pooled client per worker process, shared by every service
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def _reset_client_after_fork():
+    # Sockets and monitor threads are not fork-safe, the child builds its own client
+    global _client, _client_pid, _client_lock
+    _client = None
+    _client_pid = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_client_after_fork)
+
+
+# Shared database access layer
+class DatabaseModel:
+    def __init__(self, database_name='microservices'):
+        self.database_name = database_name
+        self.client_options = None
+        self.stream_batch_size = int(os.environ.get('MONGODB_STREAM_BATCH_SIZE', 200))
+        self.command_monitor = CommandMonitor()
+        self.pool_monitor = PoolMonitor()
+        self.logger = Logger()
+
+    # Method to read and validate the connection settings, the client is created lazily
+    def connect_to_database(self):
+        mongodb_user = os.environ.get('MONGODB_USER')
+        mongodb_pass = os.environ.get('MONGODB_PASS')
+        mongodb_host = os.environ.get('MONGODB_HOST')
+
+        if not mongodb_user or not mongodb_pass or not mongodb_host:
+            self.logger.critical('MongoDB environment variables are required')
+            raise ValueError('Set environment variables: MONGODB_USER, MONGODB_PASS, MONGODB_HOST')
+
+        self.client_options = {
+            'host': mongodb_host,
+            'port': int(os.environ.get('MONGODB_PORT', 27017)),
+            'username': mongodb_user,
+            'password': mongodb_pass,
+            'authSource': 'admin',
+            'authMechanism': 'SCRAM-SHA-256',
+            'serverSelectionTimeoutMS': int(os.environ.get('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+            'maxPoolSize': int(os.environ.get('MONGODB_MAX_POOL_SIZE', 50)),
+            'minPoolSize': int(os.environ.get('MONGODB_MIN_POOL_SIZE', 0)),
+            'maxIdleTimeMS': int(os.environ.get('MONGODB_MAX_IDLE_TIME_MS', 60000)),
+            'waitQueueTimeoutMS': int(os.environ.get('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 5000)),
+            'connect': False,
+            # BSON dates are UTC, they are read back with their zone so they serialize as written
+            'tz_aware': True,
+            'event_listeners': [self.command_monitor, self.pool_monitor]
+        }
+
+    # Method to get the client of the current process, creating it on first use
+    @property
+    def client(self):
+        global _client, _client_pid
+
+        pid = os.getpid()
+        if _client is not None and _client_pid == pid:
+            return _client
+
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                if self.client_options is None:
+                    self.connect_to_database()
+                try:
+                    self.pool_monitor.reset()
+                    _client = MongoClient(**self.client_options)
+                    _client_pid = pid
+                    self.logger.info(f'MongoDB client created for process {pid}')
+                except Exception as e:
+                    self.logger.critical(f'Failed to connect to the database: {e}')
+                    raise
+        return _client
+
+    @property
+    def db(self):
+        return self.client[self.database_name]
+
+    # Method to ping the database within a time limit, returns the round trip in seconds
+    def ping(self, timeout=1):
+        started_at = time.perf_counter()
+        with pymongo.timeout(timeout):
+            self.client.admin.command('ping')
+        return time.perf_counter() - started_at
+
+    # Method to get the connection pool usage of this process
+    def pool_stats(self):
+        max_pool_size = self.client_options['maxPoolSize'] if self.client_options else None
+        stats = {
+            'max_size': max_pool_size,
+            'connections': self.pool_monitor.connections,
+            'in_use': self.pool_monitor.checked_out
+        }
+        stats['utilisation'] = round(stats['in_use'] / max_pool_size, 3) if max_pool_size else None
+        return stats
+
+    # Method to get the seconds since the last acknowledged write of this process
+    def last_write_age(self):
+        last_write_at = self.command_monitor.last_write_at
+        return round(time.time() - last_write_at, 3) if last_write_at else None
+
+    # Method to read one page of a collection in _id order, returns the documents and the next cursor.
+    # With stream the cursor itself is returned, documents are fetched in batches while it is iterated.
+    # With sort_field the page is in that field's order, its cursor is the (value, _id) of the last document
+    def find_page(self, collection, query=None, after=None, limit=None, projection=None, stream=False, sort_field=None):
+        query = dict(query or {})
+        if sort_field is None:
+            if after is not None:
+                query['_id'] = {'$gt': after}
+            sort = [('_id', 1)]
+        else:
+            if after is not None:
+                sort_value, after_id = after
+                query['$or'] = [{sort_field: {'$gt': sort_value}}, {sort_field: sort_value, '_id': {'$gt': after_id}}]
+            sort = [(sort_field, 1), ('_id', 1)]
+            # The next cursor needs the sort value, even when the client did not ask for it
+            if projection and any(projection.values()):
+                projection = {**projection, sort_field: 1}
+
+        cursor = self.db[collection].find(query, projection).sort(sort)
+        if stream:
+            return cursor.batch_size(self.stream_batch_size), None
+        if limit is None:
+            return list(cursor), None
+
+        # Reading one extra document tells whether there is a next page
+        documents = list(cursor.limit(limit + 1))
+        if len(documents) > limit:
+            documents = documents[:limit]
+            if sort_field is not None:
+                return documents, (documents[-1][sort_field], documents[-1]['_id'])
+            return documents, documents[-1]['_id']
+        return documents, None
+
+    # Method to remember a deleted document, clients syncing with ?since= learn about it from here
+    def add_tombstone(self, collection, document_id, session=None):
+        self.db.tombstones.insert_one({
+            'collection': collection,
+            'document_id': document_id,
+            'deleted_at': datetime.now(timezone.utc)
+        }, session=session)
+
+    # Method to read the documents changed and deleted since a time
+    def changes_since(self, collection, since, projection=None):
+        changed = list(self.db[collection].find({'updated_at': {'$gte': since}}, projection).sort('updated_at', 1))
+        tombstones = self.db.tombstones.find(
+            {'collection': collection, 'deleted_at': {'$gte': since}}, {'document_id': 1}
+        ).sort('deleted_at', 1)
+        deleted = [tombstone['document_id'] for tombstone in tombstones]
+        return changed, deleted
+
+    # Method to create the registered indexes, existing ones are left untouched
+    def ensure_indexes(self, indexes=None):
+        created = {}
+        for collection, models in (indexes or INDEXES).items():
+            try:
+                created[collection] = self.db[collection].create_indexes(models)
+            except ServerSelectionTimeoutError as e:
+                # An unreachable server would make every collection wait for the whole timeout
+                self.logger.error(f'Error creating the indexes, the database is not reachable: {e}')
+                break
+            except PyMongoError as e:
+                # A collection that can't be indexed (e.g. duplicated usernames) must not stop the others
+                self.logger.error(f'Error creating the indexes of {collection}: {e}')
+        return created
+
+    # Method to compare the indexes in the database with the registered ones
+    def index_report(self, indexes=None):
+        indexes = indexes or INDEXES
+        report = {}
+        collections = set(self.db.list_collection_names(filter={'name': {'$not': {'$regex': '^system\\.'}}}))
+        for collection in sorted(collections | set(indexes)):
+            expected = {model.document['name']: dict(model.document['key']) for model in indexes.get(collection, [])}
+            existing = {
+                name: dict(info['key'])
+                for name, info in self.db[collection].index_information().items()
+                if name != '_id_'
+            } if collection in collections else {}
+
+            # An index with a registered name but other keys is both missing and extra
+            missing = sorted(name for name, key in expected.items() if existing.get(name) != key)
+            extra = sorted(name for name, key in existing.items() if expected.get(name) != key)
+            if missing or extra:
+                report[collection] = {'missing': missing, 'extra': extra}
+        return report
+
+    # Method to close connection
+    def close_connection(self):
+        global _client, _client_pid
+
+        with _client_lock:
+            if _client is not None and _client_pid == os.getpid():
+                _client.close()
+            _client = None
+            _client_pid = None
@@ -0,0 +1,47 @@
+import os
+from pymongo import ASCENDING, IndexModel
+
+# Deletions are remembered this long, a ?since= token older than that needs a full refetch
+TOMBSTONE_TTL_SECONDS = int(os.environ.get('TOMBSTONE_TTL_SECONDS', 7 * 24 * 60 * 60))
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60))
+
+# Indexes of every collection, keyed by collection name. ensure_indexes creates them and
+# the diagnostics endpoint reports the ones that are missing or not listed here
+INDEXES = {
+    'users': [
+        # Login looks users up by username, which must also be unique
+        IndexModel([('username', ASCENDING)], name='username_unique', unique=True)
+    ],
+    'payments': [
+        # Active payments are listed in _id order
+        IndexModel([('active', ASCENDING), ('_id', ASCENDING)], name='active_id')
+    ],
+    'orders': [
+        IndexModel([('status', ASCENDING), ('table', ASCENDING)], name='status_table'),
+        # Watermark of the order feed and of ?since= syncs
+        IndexModel([('updated_at', ASCENDING)], name='updated_at')
+    ],
+    'inventories': [
+        IndexModel([('updated_at', ASCENDING)], name='updated_at')
+    ],
+    'reservations': [
+        # Range queries on the reservation datetime, read in date_at then _id order
+        IndexModel([('date_at', ASCENDING), ('_id', ASCENDING)], name='date_at_id'),
+        IndexModel([('updated_at', ASCENDING)], name='updated_at')
+    ],
+    'idempotency_keys': [
+        # Stored responses are kept long enough for any client retry
+        IndexModel([('created_at', ASCENDING)], name='created_at_ttl', expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+    ],
+    'tombstones': [
+        IndexModel([('collection', ASCENDING), ('deleted_at', ASCENDING)], name='collection_deleted_at'),
+        IndexModel([('deleted_at', ASCENDING)], name='deleted_at_ttl', expireAfterSeconds=TOMBSTONE_TTL_SECONDS)
+    ],
+    # Created by GridFS on first upload, listed so they are not reported as extra
+    'images.files': [
+        IndexModel([('filename', ASCENDING), ('uploadDate', ASCENDING)], name='filename_1_uploadDate_1')
+    ],
+    'images.chunks': [
+        IndexModel([('files_id', ASCENDING), ('n', ASCENDING)], name='files_id_1_n_1', unique=True)
+    ]
+}
@@ -1,15 +1,27 @@
+import os
+import time
 from flask import Blueprint, jsonify
 from flasgger import swag_from
+from logger.logger_base import Logger
 
 # Routes for Healthcheck
 class HealthcheckRoutes(Blueprint):
-    def __init__(self):
+    def __init__(self, db_conn):
         super().__init__('healthcheck', __name__)
+        self.db_conn = db_conn
+        self.logger = Logger()
+        # The last readiness probe is reused for a short time, frequent polls do not add database load
+        self.readiness = None
+        self.readiness_checked_at = 0
+        self.readiness_ttl = float(os.environ.get('READINESS_CACHE_SECONDS', 2))
+        self.ping_timeout = float(os.environ.get('READINESS_PING_TIMEOUT', 0.5))
         self.register_routes()
 
     # Routes
     def register_routes(self):
         self.route('/healthcheck', methods=['GET', 'OPTIONS'])(self.healthcheck)
+        self.route('/readyz', methods=['GET'])(self.readyz)
+        self.route('/diagnostics/indexes', methods=['GET'])(self.index_diagnostics)
     
   
     @swag_from({
@@ -31,4 +43,78 @@ class HealthcheckRoutes(Blueprint):
     })
     # Veriifying a healthcheck
     def healthcheck(self):
-        return jsonify({ 'status': 'up' }), 200
\ No newline at end of file
+        return jsonify({ 'status': 'up' }), 200
+
+    # Probing the database and collecting the pool stats
+    def probe(self):
+        readiness = {
+            'status': 'ready',
+            'database': {'latency_ms': None},
+            'pool': self.db_conn.pool_stats(),
+            'last_write_age_seconds': self.db_conn.last_write_age()
+        }
+        try:
+            latency = self.db_conn.ping(self.ping_timeout)
+            readiness['database']['latency_ms'] = round(latency * 1000, 3)
+        except Exception as e:
+            self.logger.error(f'Readiness probe failed: {e}')
+            readiness['status'] = 'unavailable'
+            readiness['database']['error'] = str(e)
+        return readiness
+
+    @swag_from({
+        'tags': ['Health'],
+        'responses': {
+            200: {
+                'description': 'The database answers, the service can receive traffic',
+                'schema': {
+                    'type': 'object',
+                    'properties': {
+                        'status': {'type': 'string'},
+                        'database': {'type': 'object'},
+                        'pool': {'type': 'object'},
+                        'last_write_age_seconds': {'type': 'number'}
+                    }
+                }
+            },
+            503: {
+                'description': 'The database is unreachable'
+            }
+        }
+    })
+    # Verifying that the service can reach its database
+    def readyz(self):
+        now = time.monotonic()
+        if self.readiness is None or now - self.readiness_checked_at >= self.readiness_ttl:
+            self.readiness = self.probe()
+            self.readiness_checked_at = now
+
+        status = 200 if self.readiness['status'] == 'ready' else 503
+        return jsonify(self.readiness), status
+
+    @swag_from({
+        'tags': ['Health'],
+        'responses': {
+            200: {
+                'description': 'Indexes missing from the database or not in the registry, per collection',
+                'schema': {
+                    'type': 'object',
+                    'properties': {
+                        'status': {'type': 'string'},
+                        'collections': {'type': 'object'}
+                    }
+                }
+            },
+            500: {
+                'description': 'Internal server error'
+            }
+        }
+    })
+    # Comparing the database indexes with the registered ones
+    def index_diagnostics(self):
+        try:
+            report = self.db_conn.index_report()
+        except Exception as e:
+            self.logger.error(f'Error reading the indexes: {e}')
+            return jsonify({'error': f'Error reading the indexes: {e}'}), 500
+        return jsonify({'status': 'drift' if report else 'ok', 'collections': report}), 200
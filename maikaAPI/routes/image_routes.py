@@ -0,0 +1,63 @@
+from flask import Blueprint, Response, jsonify, request
+from logger.logger_base import Logger
+from flasgger import swag_from
+
+# Images are addressed by the hash of their content, so a url never changes its bytes
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Routes for Images
+class ImageRoutes(Blueprint):
+    def __init__(self, image_service):
+        super().__init__('image', __name__)
+        self.image_service = image_service
+        self.register_routes()
+        self.logger = Logger()
+
+    # Routes
+    def register_routes(self):
+        self.route('/api/v1/images/<string:image_hash>', methods=['GET'])(self.get_image)
+
+    @swag_from({
+        'tags': ['Images'],
+        'parameters': [
+            {
+                'name': 'image_hash',
+                'in': 'path',
+                'required': True,
+                'type': 'string',
+                'description': 'sha256 of the image content'
+            }
+        ],
+        'responses': {
+            200: {
+                'description': 'Image bytes'
+            },
+            304: {
+                'description': 'The cached image is still valid'
+            },
+            404: {
+                'description': 'Image not found'
+            }
+        }
+    })
+    # Getting an image
+    def get_image(self, image_hash):
+        # The hash is the etag, a matching client copy needs no database read
+        if image_hash in request.if_none_match:
+            response = Response(status=304)
+        else:
+            try:
+                image = self.image_service.get_image(image_hash)
+            except Exception as e:
+                self.logger.error(f'Error fetching the image {image_hash}: {e}')
+                return jsonify({'error': f'Error fetching the image: {e}'}), 500
+            if not image:
+                return jsonify({'error': 'Image not found'}), 404
+            data, content_type = image
+            response = Response(data, mimetype=content_type)
+
+        response.set_etag(image_hash)
+        response.cache_control.public = True
+        response.cache_control.max_age = IMAGE_MAX_AGE
+        response.cache_control.immutable = True
+        return response
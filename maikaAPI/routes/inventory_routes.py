@@ -1,7 +1,9 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
 from marshmallow import ValidationError
 from logger.logger_base import Logger
 from flasgger import swag_from
+from schemas.pagination_schema import PaginationSchema
+from schemas.projection_schema import ProjectionSchema
 
 # Routes for Inventory
 class InventoryRoutes(Blueprint):
@@ -9,6 +11,8 @@ class InventoryRoutes(Blueprint):
         super().__init__('inventory', __name__)
         self.inventory_service = inventory_service
         self.inventory_schema = inventory_schema
+        self.pagination_schema = PaginationSchema()
+        self.projection_schema = ProjectionSchema(heavy_fields=('image',))
         self.register_routes()
         self.logger = Logger()
 
@@ -18,10 +22,49 @@ class InventoryRoutes(Blueprint):
         self.route('/api/v1/inventories', methods=['POST', 'OPTIONS'])(self.add_inventories)
         self.route('/api/v1/inventories/<int:inventory_id>', methods = ['PUT', 'OPTIONS'])(self.update_inventory)
         self.route('/api/v1/inventories/existence/<int:inventory_id>', methods = ['PUT', 'OPTIONS'])(self.update_inventory_existence)
+        self.route('/api/v1/inventories/existence', methods = ['PUT', 'OPTIONS'])(self.update_inventories_existence)
+        self.route('/api/v1/inventories/<int:inventory_id>/consume', methods = ['POST', 'OPTIONS'])(self.consume_inventory)
         self.route('/api/v1/inventories/<int:inventory_id>', methods = ['DELETE', 'OPTIONS'])(self.delete_inventory)
     
     @swag_from({
         'tags': ['Inventories'],
+        'parameters': [
+            {
+                'name': 'after',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Return the documents whose _id is greater than this cursor'
+            },
+            {
+                'name': 'limit',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Page size, enables the paginated response {items, next}'
+            },
+            {
+                'name': 'stream',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Stream every document as NDJSON, also enabled by Accept: application/x-ndjson'
+            },
+            {
+                'name': 'since',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Sync token of a previous call, returns {changed, deleted, since} with only the changes'
+            },
+            {
+                'name': 'fields',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Comma separated fields to return, * for all. The image is left out by default'
+            }
+        ],
         'responses': {
             200: {
                 'description': 'Get All inventories',
@@ -42,8 +85,33 @@ class InventoryRoutes(Blueprint):
     })
     # Getting all the inventories.
     def get_inventories(self):
-        inventories = self.inventory_service.get_all_inventories()
-        return jsonify(inventories), 200
+        try:
+            page = self.pagination_schema.load_page(request.args, request.accept_mimetypes)
+            projection = self.projection_schema.load_projection(request.args)
+            since = self.pagination_schema.load_since(request.args)
+        except ValidationError as e:
+            return jsonify({'error': f'Invalid data {e}'}), 400
+
+        # Delta sync, only what changed since the token. Every answer carries the token of the next call
+        since_token = self.pagination_schema.next_since_token()
+        if since is not None:
+            changes = self.inventory_service.get_changes(since, projection)
+            if isinstance(changes[0], Response):
+                return changes
+            changed, deleted = changes
+            return jsonify({'changed': changed, 'deleted': deleted, 'since': since_token}), 200
+
+        result = self.inventory_service.get_all_inventories(None, page['after'], page['limit'], page['stream'], projection)
+        if isinstance(result[0], Response):
+            return result
+        inventories, next_cursor = result
+        if page['stream']:
+            response = current_app.json.ndjson_response(inventories)
+            response.headers['X-Sync-Token'] = since_token
+            return response
+        if page['limit'] is not None:
+            return jsonify({'items': inventories, 'next': next_cursor}), 200, {'X-Sync-Token': since_token}
+        return jsonify(inventories), 200, {'X-Sync-Token': since_token}
     
     @swag_from({
         'tags': ['Inventories'],
@@ -106,6 +174,8 @@ class InventoryRoutes(Blueprint):
             }
 
             created_inventory = self.inventory_service.add_inventory(new_inventory)
+            if isinstance(created_inventory, str):
+                return jsonify({'error': created_inventory}), 400
             return jsonify(created_inventory), 201
         except Exception as e:
             self.logger.error(f'Error adding new inventory to the database: {e}')
@@ -191,8 +261,10 @@ class InventoryRoutes(Blueprint):
                 'image': image
             }
             updated_inventory = self.inventory_service.update_inventory(inventory_id, update_inventory)
+            if isinstance(updated_inventory, str):
+                return jsonify({'error': updated_inventory}), 400
             if updated_inventory:
-                return jsonify(update_inventory), 200
+                return jsonify(updated_inventory), 200
             else:            
                 return jsonify({'error': 'Inventory not found'}), 404
         except Exception as e:
@@ -271,6 +343,143 @@ class InventoryRoutes(Blueprint):
             self.logger.error(f'Error updating the inventory in the database: {e}')
             return jsonify({'error': f'An exception has ocurred: {e}'})
     
+    @swag_from({
+        'tags': ['Inventories'],
+        'parameters': [
+            {
+                'name': 'inventory_id',
+                'in': 'path',
+                'required': True,
+                'type': 'string',
+                'description': 'ID of the inventory to consume from'
+            },
+            {
+                'name': 'body',
+                'in': 'body',
+                'required': True,
+                'schema': {
+                    'type': 'object',
+                    'properties': {
+                        'amount': {'type': 'integer'},
+                    },
+                    'required': ['amount']
+                }
+            }
+        ],
+        'responses': {
+            200: {
+                'description': 'Existence successfully consumed',
+                'schema': {
+                    'type': 'object',
+                    'properties': {
+                        '_id': {'type': 'string'},
+                        'name': {'type': 'string'},
+                        'unit': {'type': 'string'},
+                        'existence': {'type': 'integer'},
+                        'image': {'type': 'string'},
+                    }
+                }
+            },
+            400: {
+                'description': 'Invalid data'
+            },
+            404: {
+                'description': 'Inventory not found'
+            },
+            409: {
+                'description': 'Insufficient existence'
+            },
+            500: {
+                'description': 'Internal server error'
+            }
+        }
+    })
+    # Consuming an amount from the existence of an inventory
+    def consume_inventory(self, inventory_id):
+        try:
+            request_data = request.json
+
+            if not request_data:
+                return jsonify({'error': 'Invalid data'}), 400
+
+            amount = request_data.get('amount')
+
+            try:
+                self.inventory_schema.validate_amount(amount)
+            except ValidationError as e:
+                return jsonify({'error': f'Invalid data {e}'}), 400
+
+            consumed_inventory = self.inventory_service.consume_inventory(inventory_id, amount)
+            if isinstance(consumed_inventory, str):
+                return jsonify({'error': consumed_inventory}), 409
+            if consumed_inventory:
+                return jsonify(consumed_inventory), 200
+            return jsonify({'error': 'Inventory not found'}), 404
+        except Exception as e:
+            self.logger.error(f'Error consuming the inventory in the database: {e}')
+            return jsonify({'error': f'An exception has ocurred: {e}'}), 500
+
+    @swag_from({
+        'tags': ['Inventories'],
+        'parameters': [
+            {
+                'name': 'body',
+                'in': 'body',
+                'required': True,
+                'schema': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'id': {'type': 'integer'},
+                            'existence': {'type': 'integer'},
+                            'delta': {'type': 'integer'},
+                        },
+                        'required': ['id']
+                    }
+                }
+            }
+        ],
+        'responses': {
+            200: {
+                'description': 'Existences successfully updated',
+                'schema': {
+                    'type': 'object',
+                    'properties': {
+                        'updated': {'type': 'array', 'items': {'type': 'object'}},
+                        'missing': {'type': 'array', 'items': {'type': 'integer'}},
+                        'rejected': {
+                            'type': 'array',
+                            'items': {'type': 'integer'},
+                            'description': 'Inventories left untouched, their existence does not cover the negative delta'
+                        },
+                    }
+                }
+            },
+            400: {
+                'description': 'Invalid data'
+            },
+            500: {
+                'description': 'Internal server error'
+            }
+        }
+    })
+    # Updating the existence of several inventories at once
+    def update_inventories_existence(self):
+        try:
+            request_data = request.json
+
+            try:
+                self.inventory_schema.validate_adjustments(request_data)
+            except ValidationError as e:
+                return jsonify({'error': f'Invalid data {e}'}), 400
+
+            updated_inventories, missing_ids, rejected_ids = self.inventory_service.update_inventories_existence(request_data)
+            return jsonify({'updated': updated_inventories, 'missing': missing_ids, 'rejected': rejected_ids}), 200
+        except Exception as e:
+            self.logger.error(f'Error updating the inventories in the database: {e}')
+            return jsonify({'error': f'An exception has ocurred: {e}'}), 500
+
     @swag_from({
         'tags': ['Inventories'],
         'parameters': [
@@ -302,7 +511,7 @@ class InventoryRoutes(Blueprint):
             if delete_inventory:
                 return jsonify(delete_inventory), 200
             else:
-                jsonify({'error': 'Inventory not found'}), 404
+                return jsonify({'error': 'Inventory not found'}), 404
         except Exception as e:
             self.logger.error(f'Error deleting the inventory data: {e}')
-            jsonify({'error': f'Error deleting the inventory data: {e}'}), 500
+            return jsonify({'error': f'Error deleting the inventory data: {e}'}), 500
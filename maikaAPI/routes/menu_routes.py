@@ -1,13 +1,17 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
 from marshmallow import ValidationError
 from logger.logger_base import Logger
 from flasgger import swag_from
+from schemas.pagination_schema import PaginationSchema
+from schemas.projection_schema import ProjectionSchema
 
 class MenuRoutes(Blueprint):
     def __init__(self, menu_service, menu_schema):
         super().__init__('menu', __name__)
         self.menu_service = menu_service
         self.menu_schema = menu_schema
+        self.pagination_schema = PaginationSchema()
+        self.projection_schema = ProjectionSchema(heavy_fields=('image',))
         self.register_routes()
         self.logger = Logger()
 
@@ -17,6 +21,36 @@ class MenuRoutes(Blueprint):
     
     @swag_from({
         'tags': ['meals'],
+        'parameters': [
+            {
+                'name': 'after',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Return the documents whose _id is greater than this cursor'
+            },
+            {
+                'name': 'limit',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Page size, enables the paginated response {items, next}'
+            },
+            {
+                'name': 'stream',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Stream every document as NDJSON, also enabled by Accept: application/x-ndjson'
+            },
+            {
+                'name': 'fields',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Comma separated fields to return, * for all. The image is left out by default'
+            }
+        ],
         'responses': {
             200: {
                 'description': 'Get All meals from the menu',
@@ -32,12 +66,50 @@ class MenuRoutes(Blueprint):
                         }
                     }
                 }
+            },
+            304: {
+                'description': 'The cached menu is still valid'
             }
         }
     })
 
     def get_meals(self):
-        meals = self.menu_service.get_all_meals()
+        # The full menu is answered from the worker cache, one entry per view, and revalidated with its etag
+        if set(request.args) <= {'fields'} and not self.pagination_schema.wants_stream(request.args, request.accept_mimetypes):
+            try:
+                projection = self.projection_schema.load_projection(request.args)
+            except ValidationError as e:
+                return jsonify({'error': f'Invalid data {e}'}), 400
+
+            view = request.args.get('fields', '')
+            try:
+                etag = self.menu_service.get_menu_etag(view)
+                if etag in request.if_none_match:
+                    response = Response(status=304)
+                else:
+                    etag, body = self.menu_service.get_menu_response(view, projection)
+                    response = Response(body, mimetype='application/json')
+                response.set_etag(etag)
+                response.cache_control.no_cache = True
+                return response
+            except Exception as e:
+                self.logger.error(f'Error fetching the menu: {e}')
+                return jsonify({ 'error': f'Error fetching the menu: {e}' }), 500
+
+        try:
+            page = self.pagination_schema.load_page(request.args, request.accept_mimetypes)
+            projection = self.projection_schema.load_projection(request.args)
+        except ValidationError as e:
+            return jsonify({'error': f'Invalid data {e}'}), 400
+
+        result = self.menu_service.get_all_meals(None, page['after'], page['limit'], page['stream'], projection)
+        if isinstance(result[0], Response):
+            return result
+        meals, next_cursor = result
+        if page['stream']:
+            return current_app.json.ndjson_response(meals)
+        if page['limit'] is not None:
+            return jsonify({'items': meals, 'next': next_cursor}), 200
         return jsonify(meals), 200
     
     @swag_from({
@@ -101,6 +173,8 @@ class MenuRoutes(Blueprint):
             }
 
             created_meal = self.menu_service.add_meal(new_meal)
+            if isinstance(created_meal, str):
+                return jsonify({'error': created_meal}), 400
             return jsonify(created_meal), 201
         except Exception as e:
             self.logger.error(f'Error adding new meal to the database: {e}')
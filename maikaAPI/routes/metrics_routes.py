@@ -0,0 +1,26 @@
+from flask import Blueprint, Response
+from flasgger import swag_from
+
+# Routes for Metrics
+class MetricsRoutes(Blueprint):
+    def __init__(self, metrics_service):
+        super().__init__('metrics', __name__)
+        self.metrics_service = metrics_service
+        self.register_routes()
+
+    # Routes
+    def register_routes(self):
+        self.route('/metrics', methods=['GET'])(self.metrics)
+
+    @swag_from({
+        'tags': ['Health'],
+        'responses': {
+            200: {
+                'description': 'Metrics in the Prometheus text exposition format'
+            }
+        }
+    })
+    # Exposing the metrics of every worker
+    def metrics(self):
+        body, content_type = self.metrics_service.render()
+        return Response(body, content_type=content_type)
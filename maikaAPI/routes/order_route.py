@@ -1,20 +1,33 @@
-from flask import Blueprint, jsonify, request
+import os
+import queue
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from marshmallow import ValidationError
 from logger.logger_base import Logger
 from flasgger import swag_from
+from schemas.pagination_schema import PaginationSchema
+from schemas.projection_schema import ProjectionSchema
 
 
 class OrderRoutes(Blueprint):
-    def __init__(self, order_service, order_schema):
+    def __init__(self, order_service, order_schema, order_feed, idempotency_service):
         super().__init__('order', __name__)
         self.order_service = order_service
         self.order_schema = order_schema
+        self.order_feed = order_feed
+        self.idempotency_service = idempotency_service
+        self.heartbeat_seconds = float(os.environ.get('ORDER_FEED_HEARTBEAT_SECONDS', 15))
+        # Largest list accepted by the bulk endpoint, the orders are validated and written in one request
+        self.bulk_max_orders = int(os.environ.get('ORDER_BULK_MAX_ORDERS', 500))
+        self.pagination_schema = PaginationSchema()
+        self.projection_schema = ProjectionSchema()
         self.register_routes()
         self.logger = Logger()
 
     def register_routes(self):
         self.route('/api/v1/orders', methods=['GET'])(self.get_orders)
-        self.route('/api/v1/orders', methods=['POST'])(self.add_order)
+        self.route('/api/v1/orders', methods=['POST'])(self.idempotency_service.idempotent('orders', self.add_order))
+        self.route('/api/v1/orders/bulk', methods=['POST'])(self.add_orders)
+        self.route('/api/v1/orders/stream', methods=['GET'])(self.stream_orders)
         self.route('/api/v1/orders/<int:order_id>', methods=['PUT'])(self.update_order)
         self.route('/api/v1/orders/<int:order_id>', methods=['DELETE'])(self.delete_order)
 
@@ -22,6 +35,57 @@ class OrderRoutes(Blueprint):
         'tags': ['Orders'],
         'summary': 'Retrieve all orders',
         'description': 'Fetch a list of all orders in the system.',
+        'parameters': [
+            {
+                'name': 'after',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Return the documents whose _id is greater than this cursor'
+            },
+            {
+                'name': 'limit',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Page size, enables the paginated response {items, next}'
+            },
+            {
+                'name': 'stream',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Stream every document as NDJSON, also enabled by Accept: application/x-ndjson'
+            },
+            {
+                'name': 'since',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Sync token of a previous call, returns {changed, deleted, since} with only the changes'
+            },
+            {
+                'name': 'fields',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Comma separated fields to return, * for all'
+            },
+            {
+                'name': 'status',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Only orders with this status'
+            },
+            {
+                'name': 'table',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Only orders of this table'
+            }
+        ],
         'responses': {
             200: {
                 'description': 'A list of orders',
@@ -55,14 +119,77 @@ class OrderRoutes(Blueprint):
         
     
     def get_orders(self):
-        orders = self.order_service.get_all_orders()
-        return jsonify(orders), 200
+        try:
+            page = self.pagination_schema.load_page(request.args, request.accept_mimetypes)
+            projection = self.projection_schema.load_projection(request.args)
+            since = self.pagination_schema.load_since(request.args)
+            filters = self.order_schema.load_filters(request.args)
+        except ValidationError as e:
+            return jsonify({'error': f'Invalid data: {e}'}), 400
+
+        # Delta sync, only what changed since the token. Every answer carries the token of the next call
+        since_token = self.pagination_schema.next_since_token()
+        if since is not None:
+            changes = self.order_service.get_changes(since, projection)
+            if isinstance(changes[0], Response):
+                return changes
+            changed, deleted = changes
+            return jsonify({'changed': changed, 'deleted': deleted, 'since': since_token}), 200
+
+        result = self.order_service.get_all_orders(filters, page['after'], page['limit'], page['stream'], projection)
+        if isinstance(result[0], Response):
+            return result
+        orders, next_cursor = result
+        if page['stream']:
+            response = current_app.json.ndjson_response(orders)
+            response.headers['X-Sync-Token'] = since_token
+            return response
+        if page['limit'] is not None:
+            return jsonify({'items': orders, 'next': next_cursor}), 200, {'X-Sync-Token': since_token}
+        return jsonify(orders), 200, {'X-Sync-Token': since_token}
+
+    # Validates the request data of one order and builds the new order, raises ValidationError
+    def build_new_order(self, request_data):
+        if not isinstance(request_data, dict):
+            raise ValidationError('Each order must be an object')
+
+        name = request_data.get('name')
+        table = request_data.get('table')
+        dishes = request_data.get('dishes')
+        time = request_data.get('time')  # Opcional, capturamos el tiempo
+
+        # Validate fields
+        self.order_schema.validate_name(name)
+        self.order_schema.validate_table(table)
+        self.order_schema.validate_dishes(dishes)
+        # Opcional, validar tiempo si se proporciona
+        if time:
+            self.order_schema.validate_time(time)
+
+        new_order = {
+            'name': name,
+            'table': table,
+            'dishes': dishes,
+            'status': "pending"
+        }
+
+        # Si se proporciona tiempo, lo añadimos a la orden
+        if time:
+            new_order['time'] = time
+        return new_order
 
     @swag_from({
         'tags': ['Orders'],
         'summary': 'Create a new order',
         'description': 'Add a new order with a name, table number, dishes, and time.',
         'parameters': [
+            {
+                'name': 'Idempotency-Key',
+                'in': 'header',
+                'required': False,
+                'type': 'string',
+                'description': 'Retries with the same key get the first response instead of creating a duplicate'
+            },
             {
                 'name': 'body',
                 'in': 'body',
@@ -92,6 +219,8 @@ class OrderRoutes(Blueprint):
         'responses': {
             201: {'description': 'Order successfully created'},
             400: {'description': 'Invalid data'},
+            409: {'description': 'A request with the same Idempotency-Key is in progress'},
+            422: {'description': 'The Idempotency-Key was used with a different request'},
             500: {'description': 'Internal server error'}
         }
     })
@@ -101,40 +230,95 @@ class OrderRoutes(Blueprint):
             if not request_data:
                 return jsonify({'error': 'Invalid data'}), 400
 
-            name = request_data.get('name')
-            table = request_data.get('table')
-            dishes = request_data.get('dishes')
-            time = request_data.get('time')  # Opcional, capturamos el tiempo
-
-            # Validate fields
             try:
-                self.order_schema.validate_name(name)
-                self.order_schema.validate_table(table)
-                self.order_schema.validate_dishes(dishes)
-                # Opcional, validar tiempo si se proporciona
-                if time:
-                    self.order_schema.validate_time(time)
+                new_order = self.build_new_order(request_data)
             except ValidationError as e:
                 return jsonify({'error': f'Invalid data: {e}'}), 400
 
-            new_order = {
-                'name': name,
-                'table': table,
-                'dishes': dishes,
-                'status': "pending"
-            }
-            
-            # Si se proporciona tiempo, lo añadimos a la orden
-            if time:
-                new_order['time'] = time
-
             created_order = self.order_service.add_order(new_order)
-            self.logger.info(f'New Order Created: {created_order}')
             return jsonify(created_order), 201
         except Exception as e:
             self.logger.error(f'Error adding new order to the database: {e}')
             return jsonify({'error': f'An exception has occurred: {e}'}), 500
 
+    @swag_from({
+        'tags': ['Orders'],
+        'summary': 'Create several orders at once',
+        'description': 'Validate a list of orders and insert the valid ones in a single write. Returns the created orders and the errors by index.',
+        'parameters': [
+            {
+                'name': 'body',
+                'in': 'body',
+                'required': True,
+                'schema': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'name': {'type': 'string', 'example': 'John Doe'},
+                            'table': {'type': 'integer', 'example': 5},
+                            'dishes': {
+                                'type': 'array',
+                                'items': {
+                                    'type': 'object',
+                                    'properties': {
+                                        'name': {'type': 'string', 'example': 'Pizza'},
+                                        'price': {'type': 'number', 'example': 14.99},
+                                        'quantity': {'type': 'integer', 'example': 2}
+                                    }
+                                }
+                            },
+                            'time': {'type': 'string', 'example': '14:30:00'}
+                        },
+                        'required': ['name', 'table', 'dishes']
+                    }
+                }
+            }
+        ],
+        'responses': {
+            201: {'description': 'All the orders were created'},
+            207: {'description': 'Some orders were created, the rest are listed in errors'},
+            400: {'description': 'Invalid data, no order was created'},
+            413: {'description': 'Too many orders in one request'},
+            500: {'description': 'Internal server error'}
+        }
+    })
+    def add_orders(self):
+        try:
+            request_data = request.json
+            if not request_data or not isinstance(request_data, list):
+                return jsonify({'error': 'Invalid data: expected a non-empty list of orders'}), 400
+            if len(request_data) > self.bulk_max_orders:
+                return jsonify({'error': f'Too many orders: at most {self.bulk_max_orders} per request'}), 413
+
+            # Validating every order first, only the valid ones are written
+            new_orders = []
+            positions = []
+            errors = []
+            for index, order_data in enumerate(request_data):
+                try:
+                    new_orders.append(self.build_new_order(order_data))
+                    positions.append(index)
+                except ValidationError as e:
+                    errors.append({'index': index, 'error': f'Invalid data: {e}'})
+
+            created_orders = []
+            if new_orders:
+                created_orders, write_errors = self.order_service.add_orders(new_orders)
+                for position, message in write_errors.items():
+                    errors.append({'index': positions[position], 'error': message})
+                errors.sort(key=lambda error: error['index'])
+
+            if not created_orders:
+                status = 400 if not new_orders else 500
+            else:
+                status = 207 if errors else 201
+            self.logger.info(f'Bulk order request: {len(created_orders)} created, {len(errors)} failed')
+            return jsonify({'created': created_orders, 'errors': errors}), status
+        except Exception as e:
+            self.logger.error(f'Error adding new orders to the database: {e}')
+            return jsonify({'error': f'An exception has occurred: {e}'}), 500
+
     @swag_from({
         'tags': ['Orders'],
         'summary': 'Update an existing order',
@@ -216,7 +400,7 @@ class OrderRoutes(Blueprint):
 
             updated_order = self.order_service.update_order(order_id, update_order)
             if updated_order:
-                return jsonify(update_order), 200
+                return jsonify(updated_order), 200
             else:
                 return jsonify({'error': 'Order not found'}), 404
         except Exception as e:
@@ -254,3 +438,45 @@ class OrderRoutes(Blueprint):
             self.logger.error(f'Error deleting the order data: {e}')
             return jsonify({'error': f'Error deleting the order data: {e}'}), 500
 
+    @swag_from({
+        'tags': ['Orders'],
+        'produces': ['text/event-stream'],
+        'responses': {
+            200: {
+                'description': 'Server-Sent Events: a snapshot event with every order, then insert, update and delete events'
+            }
+        }
+    })
+    def stream_orders(self):
+    # Pushes the order changes to a display, the connection stays open
+        # Subscribed before reading the snapshot, so no change falls in between
+        subscriber = self.order_feed.subscribe()
+        orders = self.order_service.get_all_orders()
+        if isinstance(orders[0], Response):
+            self.order_feed.unsubscribe(subscriber)
+            return orders
+        orders = orders[0]
+
+        def event(name, data):
+            return f'event: {name}\ndata: {current_app.json.dumps(data)}\n\n'
+
+        def generate():
+            yield event('snapshot', orders)
+            while True:
+                try:
+                    change = subscriber.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    # Keeps proxies from closing an idle connection
+                    yield ': heartbeat\n\n'
+                    continue
+                if change is None:
+                    yield event('reset', {'reason': 'The display fell behind, reconnect for a new snapshot'})
+                    return
+                yield event(change['type'], change)
+
+        response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        # Runs when the connection closes, even if the client left before the first event
+        response.call_on_close(lambda: self.order_feed.unsubscribe(subscriber))
+        response.cache_control.no_cache = True
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
@@ -1,25 +1,40 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
 from marshmallow import ValidationError
 from logger.logger_base import Logger
 from flasgger import swag_from
+from schemas.pagination_schema import PaginationSchema
+from schemas.projection_schema import ProjectionSchema
+from services.payment_services import ORDER_NOT_FOUND
 
 class PaymentRoutes(Blueprint):
-    def __init__(self, payment_service, payment_schema):
+    def __init__(self, payment_service, payment_schema, idempotency_service):
         super().__init__('payment', __name__)
         self.payment_service = payment_service
         self.payment_schema = payment_schema
+        self.idempotency_service = idempotency_service
+        self.pagination_schema = PaginationSchema()
+        self.projection_schema = ProjectionSchema()
         self.register_routes()
         self.logger = Logger()
 
     def register_routes(self):
         self.route('/api/v1/payments/pending', methods=['GET'])(self.get_all_orders_to_pay)
         self.route('/api/v1/payments', methods=['GET'])(self.get_all_payments)
-        self.route('/api/v1/payments', methods=['POST'])(self.add_payment)
+        self.route('/api/v1/payments', methods=['POST'])(self.idempotency_service.idempotent('payments', self.add_payment))
         self.route('/api/v1/payments/<payment_id>', methods=['DELETE'])(self.delete_payment)
 
     @swag_from({
         'tags': ['Payments'],
         'summary': 'Get all pending orders to pay',
+        'parameters': [
+            {
+                'name': 'table',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Only the orders of this table'
+            }
+        ],
         'responses': {
             200: {
                 'description': 'List of all pending orders',
@@ -32,12 +47,61 @@ class PaymentRoutes(Blueprint):
         }
     })
     def get_all_orders_to_pay(self):
-        orders = self.payment_service.get_all_orders_to_pay()
+        try:
+            filters = self.payment_schema.load_filters(request.args)
+        except ValidationError as e:
+            return jsonify({'error': f'Invalid data: {e}'}), 400
+
+        orders = self.payment_service.get_all_orders_to_pay(filters.get('table'))
         return jsonify(orders), 200
 
     @swag_from({
         'tags': ['Payments'],
         'summary': 'Get all payments',
+        'parameters': [
+            {
+                'name': 'after',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Return the documents whose _id is greater than this cursor'
+            },
+            {
+                'name': 'limit',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Page size, enables the paginated response {items, next}'
+            },
+            {
+                'name': 'stream',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Stream every document as NDJSON, also enabled by Accept: application/x-ndjson'
+            },
+            {
+                'name': 'fields',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Comma separated fields to return, * for all'
+            },
+            {
+                'name': 'active',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Filter by the active flag, defaults to true'
+            },
+            {
+                'name': 'table',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Only payments of this table'
+            }
+        ],
         'responses': {
             200: {
                 'description': 'List of all payments',
@@ -50,13 +114,34 @@ class PaymentRoutes(Blueprint):
         }
     })
     def get_all_payments(self):
-        orders = self.payment_service.get_all_payments()
-        return jsonify(orders), 200
+        try:
+            page = self.pagination_schema.load_page(request.args, request.accept_mimetypes)
+            projection = self.projection_schema.load_projection(request.args)
+            filters = self.payment_schema.load_filters(request.args)
+        except ValidationError as e:
+            return jsonify({'error': f'Invalid data: {e}'}), 400
+
+        result = self.payment_service.get_all_payments(filters, page['after'], page['limit'], page['stream'], projection)
+        if isinstance(result[0], Response):
+            return result
+        payments, next_cursor = result
+        if page['stream']:
+            return current_app.json.ndjson_response(payments)
+        if page['limit'] is not None:
+            return jsonify({'items': payments, 'next': next_cursor}), 200
+        return jsonify(payments), 200
 
     @swag_from({
         'tags': ['Payments'],
         'summary': 'Add a new payment',
         'parameters': [
+    {
+        'name': 'Idempotency-Key',
+        'in': 'header',
+        'required': False,
+        'type': 'string',
+        'description': 'Retries with the same key get the first response instead of creating a duplicate'
+    },
     {
         'name': 'body',
         'in': 'body',
@@ -104,6 +189,15 @@ class PaymentRoutes(Blueprint):
                     }
                 }
             },
+            404: {
+                'description': 'Order not found'
+            },
+            409: {
+                'description': 'The order is already being paid, its total does not match, or a request with the same Idempotency-Key is in progress'
+            },
+            422: {
+                'description': 'The Idempotency-Key was used with a different request'
+            },
             500: {
                 'description': 'Server error',
                 'content': {
@@ -149,7 +243,8 @@ class PaymentRoutes(Blueprint):
             }
 
             created_payment = self.payment_service.add_payment(new_payment)
-            self.logger.info(f'New Payment Created: {created_payment}')
+            if isinstance(created_payment, str):
+                return jsonify({'error': created_payment}), 404 if created_payment == ORDER_NOT_FOUND else 409
             return jsonify(created_payment), 201
 
         except Exception as e:
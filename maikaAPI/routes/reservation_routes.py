@@ -1,25 +1,88 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
 from marshmallow import ValidationError
 from logger.logger_base import Logger
 from flasgger import swag_from
+from schemas.pagination_schema import PaginationSchema
+from schemas.projection_schema import ProjectionSchema
 
 class ReservationRoute(Blueprint):
     def __init__(self, reservation_service, reservation_schema):
         super().__init__('reservation', __name__)
         self.reservation_service = reservation_service
         self.reservation_schema = reservation_schema
+        self.pagination_schema = PaginationSchema()
+        self.projection_schema = ProjectionSchema()
         self.register_routes()
         self.logger = Logger()
 
     # Register the API endpoints with corresponding methods
     def register_routes(self):
         self.route('/api/v1/reservations', methods=['GET'])(self.get_reservations)
+        self.route('/api/v1/reservations/availability', methods=['GET'])(self.get_availability)
         self.route('/api/v1/reservations', methods=['POST'])(self.add_reservation)
         self.route('/api/v1/reservations/<int:reservation_id>', methods = ['PUT'])(self.update_reservation)
         self.route('/api/v1/reservations/<int:reservation_id>', methods = ['DELETE'])(self.delete_reservation)
     
     @swag_from({
         'tags': ['Reservations'],
+        'parameters': [
+            {
+                'name': 'after',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'The next cursor of the previous page, an _id or, with a date range, the date_at and _id of its last document'
+            },
+            {
+                'name': 'limit',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Page size, enables the paginated response {items, next}'
+            },
+            {
+                'name': 'stream',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Stream every document as NDJSON, also enabled by Accept: application/x-ndjson'
+            },
+            {
+                'name': 'since',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Sync token of a previous call, returns {changed, deleted, since} with only the changes'
+            },
+            {
+                'name': 'fields',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Comma separated fields to return, * for all'
+            },
+            {
+                'name': 't_reservation',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Only reservations of this type'
+            },
+            {
+                'name': 'from',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Only reservations at or after this local ISO 8601 date or datetime, the range is read in date_at order'
+            },
+            {
+                'name': 'to',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Only reservations before this local ISO 8601 date or datetime'
+            }
+        ],
         'responses': {
             200: {
                 'description': 'Get All Reservations',
@@ -29,6 +92,7 @@ class ReservationRoute(Blueprint):
                         'type': 'object',
                         'properties': {
                             'date': {'type': 'string'},
+                            'date_at': {'type': 'string'},
                             'people': {'type': 'string'},
                             't_reservation': {'type': 'string'},
                             'name': {'type': 'string'},
@@ -43,10 +107,94 @@ class ReservationRoute(Blueprint):
         }
     })
     def get_reservations(self):
-    # Fetches all reservations from the reservation service
-        reservations = self.reservation_service.get_all_reservations()
-        return jsonify(reservations), 200
+    # Fetches a page of reservations from the reservation service
+        try:
+            filters = self.reservation_schema.load_filters(request.args)
+            # A date range is read in chronological order
+            sort_field = 'date_at' if 'date_at' in filters else None
+            page = self.pagination_schema.load_page(request.args, request.accept_mimetypes, sort_field)
+            projection = self.projection_schema.load_projection(request.args)
+            since = self.pagination_schema.load_since(request.args)
+        except ValidationError as e:
+            return jsonify({'error': f'Invalid data {e}'}), 400
+
+        # Delta sync, only what changed since the token. Every answer carries the token of the next call
+        since_token = self.pagination_schema.next_since_token()
+        if since is not None:
+            changes = self.reservation_service.get_changes(since, projection)
+            if isinstance(changes[0], Response):
+                return changes
+            changed, deleted = changes
+            return jsonify({'changed': changed, 'deleted': deleted, 'since': since_token}), 200
+
+        result = self.reservation_service.get_all_reservations(
+            filters, page['after'], page['limit'], page['stream'], projection, sort_field
+        )
+        if isinstance(result[0], Response):
+            return result
+        reservations, next_cursor = result
+        if page['stream']:
+            response = current_app.json.ndjson_response(reservations)
+            response.headers['X-Sync-Token'] = since_token
+            return response
+        if page['limit'] is not None:
+            return jsonify({'items': reservations, 'next': self.pagination_schema.dump_cursor(next_cursor)}), 200, {'X-Sync-Token': since_token}
+        return jsonify(reservations), 200, {'X-Sync-Token': since_token}
     
+    @swag_from({
+        'tags': ['Reservations'],
+        'parameters': [
+            {
+                'name': 'date',
+                'in': 'query',
+                'required': True,
+                'type': 'string',
+                'description': 'Day to check, YYYY-MM-DD'
+            }
+        ],
+        'responses': {
+            200: {
+                'description': 'Covers left per slot of the day',
+                'schema': {
+                    'type': 'object',
+                    'properties': {
+                        'date': {'type': 'string'},
+                        'capacity': {'type': 'integer'},
+                        'max_party': {'type': 'integer'},
+                        'slots': {
+                            'type': 'array',
+                            'items': {
+                                'type': 'object',
+                                'properties': {
+                                    'time': {'type': 'string'},
+                                    'remaining': {'type': 'integer'},
+                                    'bookable': {'type': 'integer'}
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            400: {
+                'description': 'Invalid data'
+            },
+            500: {
+                'description': 'Internal server error'
+            }
+        }
+    })
+    def get_availability(self):
+    # Answers from the slot counters of the day, no reservation is read
+        try:
+            day = self.reservation_schema.load_availability_date(request.args)
+        except ValidationError as e:
+            return jsonify({'error': f'Invalid data {e}'}), 400
+
+        availability = self.reservation_service.get_availability(day)
+        if isinstance(availability, tuple):
+            return availability
+        return jsonify(availability), 200
+
     @swag_from({
         'tags': ['Reservations'],
         'parameters': [
@@ -77,6 +225,9 @@ class ReservationRoute(Blueprint):
             400: {
                 'description': 'Invalid data'
             },
+            409: {
+                'description': 'No covers left in the requested slots'
+            },
             500: {
                 'description': 'Internal server error'
             }
@@ -113,8 +264,15 @@ class ReservationRoute(Blueprint):
             except ValidationError as e:
                 return jsonify({ 'error': 'Invalid data' }), 400
 
+            date_at = self.reservation_schema.parse_date(date)
+            try:
+                self.reservation_service.slot_service.validate_booking(date_at, people)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
             new_reservation = {
                 'date': date,
+                'date_at': date_at,
                 'people': people,
                 't_reservation': t_reservation,
                 'name': name,
@@ -125,6 +283,8 @@ class ReservationRoute(Blueprint):
             }
 
             created_reservation = self.reservation_service.add_reservation(new_reservation)
+            if isinstance(created_reservation, str):
+                return jsonify({'error': created_reservation}), 409
             return jsonify(created_reservation), 201
         except Exception as e:
             self.logger.error(f'Error adding new Reservation to the database: {e}')
@@ -183,6 +343,9 @@ class ReservationRoute(Blueprint):
             404: {
                 'description': 'Reservation not found'
             },
+            409: {
+                'description': 'No covers left in the requested slots'
+            },
             500: {
                 'description': 'Internal server error'
             }
@@ -216,10 +379,17 @@ class ReservationRoute(Blueprint):
                 self.reservation_schema.validate_special(special)
             except ValidationError as e:
                 return jsonify({'error': f'Invalid data {e}'}), 400
+
+            date_at = self.reservation_schema.parse_date(date)
+            try:
+                self.reservation_service.slot_service.validate_booking(date_at, people)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
             update_reservation = {
                 '_id': reservation_id,
                 'date': date,
+                'date_at': date_at,
                 'people': people,
                 't_reservation': t_reservation,
                 'name': name,
@@ -229,8 +399,10 @@ class ReservationRoute(Blueprint):
                 'special': special
             }
             updated_reservation = self.reservation_service.update_reservation(reservation_id, update_reservation)
+            if isinstance(updated_reservation, str):
+                return jsonify({'error': updated_reservation}), 409
             if updated_reservation:
-                return jsonify(update_reservation), 200
+                return jsonify(updated_reservation), 200
             else:            
                 return jsonify({'error': 'Reservation not found'}), 404
         except Exception as e:
@@ -268,7 +440,7 @@ class ReservationRoute(Blueprint):
             if delete_reservation:
                 return jsonify(delete_reservation), 200
             else:
-                jsonify({'error': 'Reservation not found'}), 404
+                return jsonify({'error': 'Reservation not found'}), 404
         except Exception as e:
             self.logger.error(f'Error deleting the Reservation data: {e}')
-            jsonify({'error': f'Error deleting the Reservation data: {e}'}), 500
+            return jsonify({'error': f'Error deleting the Reservation data: {e}'}), 500
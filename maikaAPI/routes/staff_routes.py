@@ -1,13 +1,17 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
 from marshmallow import ValidationError
 from logger.logger_base import Logger
 from flasgger import swag_from
+from schemas.pagination_schema import PaginationSchema
+from schemas.projection_schema import ProjectionSchema
 
 class StaffRoutes(Blueprint):
     def __init__(self, staff_service, staff_schema):
         super().__init__('staff', __name__)
         self.staff_service = staff_service
         self.staff_schema = staff_schema
+        self.pagination_schema = PaginationSchema()
+        self.projection_schema = ProjectionSchema(heavy_fields=('avatar',))
         self.register_routes()
         self.logger = Logger()
 
@@ -19,6 +23,43 @@ class StaffRoutes(Blueprint):
 
     @swag_from({
         'tags': ['Staff'],
+        'parameters': [
+            {
+                'name': 'after',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Return the documents whose _id is greater than this cursor'
+            },
+            {
+                'name': 'limit',
+                'in': 'query',
+                'required': False,
+                'type': 'integer',
+                'description': 'Page size, enables the paginated response {items, next}'
+            },
+            {
+                'name': 'stream',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Stream every document as NDJSON, also enabled by Accept: application/x-ndjson'
+            },
+            {
+                'name': 'fields',
+                'in': 'query',
+                'required': False,
+                'type': 'string',
+                'description': 'Comma separated fields to return, * for all. The avatar is left out by default'
+            },
+            {
+                'name': 'status',
+                'in': 'query',
+                'required': False,
+                'type': 'boolean',
+                'description': 'Only active or inactive employees'
+            }
+        ],
         'responses': {
             200: {
                 'description': 'Get all employees',
@@ -42,7 +83,21 @@ class StaffRoutes(Blueprint):
     })
     def get_staff(self):
         try:
-            staff = self.staff_service.get_all_employees()
+            page = self.pagination_schema.load_page(request.args, request.accept_mimetypes)
+            projection = self.projection_schema.load_projection(request.args)
+            filters = self.staff_schema.load_filters(request.args)
+        except ValidationError as e:
+            return jsonify({'error': e.messages}), 400
+
+        try:
+            result = self.staff_service.get_all_employees(filters, page['after'], page['limit'], page['stream'], projection)
+            if isinstance(result[0], Response):
+                return result
+            staff, next_cursor = result
+            if page['stream']:
+                return current_app.json.ndjson_response(staff)
+            if page['limit'] is not None:
+                return jsonify({'items': staff, 'next': next_cursor}), 200
             return jsonify(staff), 200
         except Exception as e:
             self.logger.error(f'Error fetching employees: {e}')
@@ -115,6 +170,8 @@ class StaffRoutes(Blueprint):
             }
 
             created_employee = self.staff_service.add_employee(new_employee)
+            if isinstance(created_employee, str):
+                return jsonify({'error': created_employee}), 400
             return jsonify(created_employee), 201
         except Exception as e:
             self.logger.error(f'Error adding new employee: {e}')
@@ -194,6 +251,8 @@ class StaffRoutes(Blueprint):
             }
 
             updated_employee = self.staff_service.update_employee(employee_id,update_employee)
+            if isinstance(updated_employee, str):
+                return jsonify({'error': updated_employee}), 400
 
             if not updated_employee:
                 return jsonify({'error': 'Employee not found'}), 404
@@ -1,12 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from marshmallow import ValidationError
 from logger.logger_base import Logger
+from schemas.pagination_schema import PaginationSchema
+from schemas.projection_schema import ProjectionSchema
 
 class UserRoutes(Blueprint):
     def __init__(self, user_service, user_schema):
         super().__init__('users', __name__)
         self.user_service = user_service
         self.user_schema = user_schema
+        self.pagination_schema = PaginationSchema()
+        self.projection_schema = ProjectionSchema(hidden_fields=('password',))
         self.logger = Logger()
         self.register_routes()
 
@@ -20,7 +24,21 @@ class UserRoutes(Blueprint):
 
     def get_all_users(self):
         try:
-            users = self.user_service.get_all_users()
+            page = self.pagination_schema.load_page(request.args, request.accept_mimetypes)
+            projection = self.projection_schema.load_projection(request.args)
+            filters = self.user_schema.load_filters(request.args)
+        except ValidationError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            result = self.user_service.get_all_users(filters, page['after'], page['limit'], page['stream'], projection)
+            if isinstance(result[0], Response):
+                return result
+            users, next_cursor = result
+            if page['stream']:
+                return current_app.json.ndjson_response(users)
+            if page['limit'] is not None:
+                return jsonify({'items': users, 'next': next_cursor}), 200
             return jsonify(users), 200
         except Exception as e:
             self.logger.error(f"Error getting users: {e}")
@@ -31,6 +49,8 @@ class UserRoutes(Blueprint):
             data = request.get_json()
             self.user_schema.validate_registration_data(data)
             created_user = self.user_service.create_user(data)
+            if isinstance(created_user, str):
+                return jsonify({'error': created_user}), 409
             return jsonify(created_user), 201
         except ValidationError as e:
             return jsonify({"error": str(e)}), 400
@@ -42,6 +62,8 @@ class UserRoutes(Blueprint):
         try:
             data = request.get_json()
             updated_user = self.user_service.update_user(user_id, data)
+            if isinstance(updated_user, str):
+                return jsonify({'error': updated_user}), 409
             if updated_user:
                 return jsonify(updated_user), 200
             else:
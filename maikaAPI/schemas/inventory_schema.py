@@ -1,4 +1,5 @@
 from marshmallow import fields, validates, ValidationError
+from services.image_service import ImageService
 
 # Schema for inventory
 class InventorySchema:
@@ -31,6 +32,33 @@ class InventorySchema:
     # Validating image
     @validates('image')
     def validate_image(self, value):
-        if not value:
-            raise ValidationError("Image must be a base-64-image string.")
+        if not ImageService.is_data_uri(value) and not ImageService.is_image_url(value):
+            raise ValidationError("Image must be a base-64-image string or an image url.")
+
+    # Validating the amount consumed from an inventory
+    def validate_amount(self, value):
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValidationError("Amount must be a positive integer.")
+
+    # Validating a batch of stock adjustments, each one sets the existence or applies a delta
+    def validate_adjustments(self, value):
+        if not value or not isinstance(value, list):
+            raise ValidationError("Adjustments must be a non-empty list.")
+
+        ids = set()
+        for adjustment in value:
+            if not isinstance(adjustment, dict):
+                raise ValidationError("Each adjustment must be an object.")
+            inventory_id = adjustment.get('id')
+            if not isinstance(inventory_id, int) or isinstance(inventory_id, bool):
+                raise ValidationError("Each adjustment must have an integer id.")
+            if inventory_id in ids:
+                raise ValidationError(f"Inventory {inventory_id} is adjusted more than once.")
+            ids.add(inventory_id)
 
+            if ('existence' in adjustment) == ('delta' in adjustment):
+                raise ValidationError("Each adjustment must have either existence or delta.")
+            if 'existence' in adjustment:
+                self.validate_existence(adjustment['existence'])
+            elif not isinstance(adjustment['delta'], int) or isinstance(adjustment['delta'], bool):
+                raise ValidationError("Delta must be an integer.")
@@ -0,0 +1,109 @@
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from bson import Decimal128, ObjectId
+from flask import g, has_request_context, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from logger.logger_base import Logger
+
+# orjson is optional, without it responses are encoded by the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Arguments orjson can honour, any other falls back to the standard library
+ORJSON_ARGS = {'default', 'ensure_ascii', 'indent', 'separators', 'sort_keys'}
+
+
+# Encoding of the BSON and Python types the standard encoders don't know
+def bson_default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, Decimal128):
+        return str(o.to_decimal())
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+# JSON provider that encodes with orjson when it is installed and adds the encoding time to the request stats
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(bson_default)
+    # Documents encoded per chunk of a streamed response
+    stream_chunk_size = 100
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.logger = Logger()
+
+    def _orjson_option(self, kwargs):
+        if orjson is None or not set(kwargs) <= ORJSON_ARGS or kwargs.get('indent') not in (None, 2):
+            return None
+        # Non string keys are kept, e.g. the errors of a bulk insert keyed by index
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    # Returns bytes when orjson did the work and str otherwise, callers convert only when needed
+    def _encode(self, obj, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            option = self._orjson_option(kwargs)
+            if option is not None:
+                try:
+                    return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+                except TypeError:
+                    # orjson rejects integers beyond 64 bits, the standard library does not
+                    pass
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and 'serialize_time' in g:
+                g.serialize_time += time.perf_counter() - started_at
+
+    def dumps(self, obj, **kwargs):
+        encoded = self._encode(obj, **kwargs)
+        return encoded.decode('utf-8') if isinstance(encoded, bytes) else encoded
+
+    def dumps_bytes(self, obj, **kwargs):
+        encoded = self._encode(obj, **kwargs)
+        return encoded if isinstance(encoded, bytes) else encoded.encode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    # Same as Flask's response but the body is built as bytes, without a round trip through str
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args['indent'] = 2
+        else:
+            dump_args['separators'] = (',', ':')
+        return self._app.response_class(self.dumps_bytes(obj, **dump_args) + b'\n', mimetype=self.mimetype)
+
+    # Streaming documents as NDJSON, only one chunk of encoded lines is held in memory at a time
+    def ndjson_response(self, documents):
+        def generate():
+            chunk = []
+            try:
+                for document in documents:
+                    chunk.append(self.dumps_bytes(document))
+                    if len(chunk) >= self.stream_chunk_size:
+                        yield b'\n'.join(chunk) + b'\n'
+                        chunk = []
+            except Exception as e:
+                # The status is already sent, the error goes out as the last line
+                self.logger.error(f'Error streaming the response: {e}')
+                chunk.append(self.dumps_bytes({'error': f'Error streaming the response: {e}'}))
+            if chunk:
+                yield b'\n'.join(chunk) + b'\n'
+
+        return self._app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -1,4 +1,5 @@
 from marshmallow import fields, validates, ValidationError
+from services.image_service import ImageService
 
 class MenuSchema:
     meal = fields.String(required=True)
@@ -25,7 +26,7 @@ class MenuSchema:
         
     @validates('image')
     def validate_image(self, value):
-        if not value:
-            raise ValidationError("Image must be a base-64-image string.")
+        if not ImageService.is_data_uri(value) and not ImageService.is_image_url(value):
+            raise ValidationError("Image must be a base-64-image string or an image url.")
         
  
\ No newline at end of file
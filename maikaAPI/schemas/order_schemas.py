@@ -1,4 +1,5 @@
 from marshmallow import ValidationError
+from schemas.pagination_schema import parse_int
 
 class OrderSchema:
     def validate_name(self, name):
@@ -42,4 +43,15 @@ class OrderSchema:
             if hours < 0 or hours > 23 or minutes < 0 or minutes > 59 or seconds < 0 or seconds > 59:
                 raise ValidationError("Invalid time values")
         except (ValueError, IndexError):
-            raise ValidationError("Invalid time format")
\ No newline at end of file
+            raise ValidationError("Invalid time format")
+
+    def load_filters(self, args):
+        """Lee los filtros de la lista de órdenes desde la query string"""
+        filters = {}
+        if args.get('status'):
+            filters['status'] = args.get('status')
+        if args.get('table') is not None:
+            table = parse_int(args.get('table'), 'table')
+            self.validate_table(table)
+            filters['table'] = table
+        return filters
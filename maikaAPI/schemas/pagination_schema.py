@@ -0,0 +1,108 @@
+import time
+import os
+from datetime import datetime, timedelta, timezone
+from marshmallow import ValidationError
+from models.indexes import TOMBSTONE_TTL_SECONDS
+
+# Parsing a boolean query string argument
+def parse_bool(value, name):
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValidationError(f"{name} must be true or false.")
+
+# Parsing an integer query string argument
+def parse_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{name} must be an integer.")
+
+
+# Schema for the keyset pagination arguments of the list endpoints
+class PaginationSchema:
+    default_limit = 50
+    max_limit = 500
+    # Each sync overlaps the previous one a little, writes stamped just before a read are not missed
+    sync_overlap_ms = int(os.environ.get('SYNC_OVERLAP_MS', 2000))
+
+    def validate_after(self, value):
+        if parse_int(value, 'after') < 0:
+            raise ValidationError("after must be a non-negative integer.")
+
+    # Pages sorted by a field are continued from the sort value and _id of their last document
+    def parse_sort_cursor(self, value):
+        sort_value, _, document_id = value.rpartition('_')
+        try:
+            return datetime.fromisoformat(sort_value), int(document_id)
+        except ValueError:
+            raise ValidationError("after must be the next cursor of the previous page.")
+
+    def parse_after(self, value, sort_field=None):
+        if sort_field is not None:
+            return self.parse_sort_cursor(value)
+        self.validate_after(value)
+        return int(value)
+
+    # Next cursor as sent to the client
+    def dump_cursor(self, cursor):
+        if isinstance(cursor, tuple):
+            sort_value, document_id = cursor
+            return f'{sort_value.isoformat()}_{document_id}'
+        return cursor
+
+    def validate_limit(self, value):
+        limit = parse_int(value, 'limit')
+        if limit < 1 or limit > self.max_limit:
+            raise ValidationError(f"limit must be an integer between 1 and {self.max_limit}.")
+
+    # Streaming is asked with ?stream=1 or by accepting NDJSON over JSON
+    def wants_stream(self, args, accept_mimetypes=None):
+        if args.get('stream') is not None:
+            return parse_bool(args.get('stream'), 'stream')
+        if accept_mimetypes is None:
+            return False
+        return accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+    def load_page(self, args, accept_mimetypes=None, sort_field=None):
+        """Returns the page to read, limit is None when the client did not ask for pagination or streams"""
+        after = args.get('after')
+        limit = args.get('limit')
+        stream = self.wants_stream(args, accept_mimetypes)
+
+        if stream:
+            # A stream reads every document after the cursor, there are no pages
+            if after is not None:
+                after = self.parse_after(after, sort_field)
+            return {'after': after, 'limit': None, 'stream': True}
+
+        if after is None and limit is None:
+            return {'after': None, 'limit': None, 'stream': False}
+
+        if after is not None:
+            after = self.parse_after(after, sort_field)
+        if limit is not None:
+            self.validate_limit(limit)
+            limit = int(limit)
+        else:
+            limit = self.default_limit
+        return {'after': after, 'limit': limit, 'stream': False}
+
+    # Delta sync tokens are a time in milliseconds since the epoch
+    def load_since(self, args):
+        value = args.get('since')
+        if value is None:
+            return None
+        since = parse_int(value, 'since')
+        if since < 0:
+            raise ValidationError("since must be a non-negative integer.")
+        # Older deletions are forgotten, such a client must fetch the full list again
+        if since < (time.time() - TOMBSTONE_TTL_SECONDS) * 1000:
+            raise ValidationError("since is older than the deletion history, fetch the full list again.")
+        return datetime.fromtimestamp(since / 1000, timezone.utc)
+
+    # Token for the next sync, taken before reading
+    def next_since_token(self):
+        moment = datetime.now(timezone.utc) - timedelta(milliseconds=self.sync_overlap_ms)
+        return str(int(moment.timestamp() * 1000))
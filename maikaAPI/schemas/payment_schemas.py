@@ -1,5 +1,6 @@
 from marshmallow import Schema, fields, validates, ValidationError
 from logger.logger_base import Logger
+from schemas.pagination_schema import parse_bool, parse_int
 
 class ItemSchema(Schema):
     name = fields.Str(required=True)
@@ -33,8 +34,9 @@ class PaymentSchema(Schema):
 
     @validates('total')
     def validate_total(self, value):
-        if not isinstance(value, int) or value < 1:
-            raise ValidationError('The total must be an integer greater than 0.')
+        # El total se vuelve a calcular con los platillos guardados de la orden
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ValidationError('The total must be a number greater than 0.')
 
     @validates('payment_type')
     def validate_payment_type(self, value):
@@ -45,3 +47,13 @@ class PaymentSchema(Schema):
     def validate_dishes(self, value):
         if not value or len(value) == 0:
             raise ValidationError('The dishes field must contain at least one dish.')
+
+    def load_filters(self, args):
+        filters = {}
+        if args.get('active') is not None:
+            filters['active'] = parse_bool(args.get('active'), 'active')
+        if args.get('table') is not None:
+            table = parse_int(args.get('table'), 'table')
+            self.validate_table(table)
+            filters['table'] = table
+        return filters
@@ -0,0 +1,43 @@
+import re
+from marshmallow import ValidationError
+
+FIELD_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$')
+
+
+# Schema for the ?fields= argument of the list endpoints, turned into a MongoDB projection
+class ProjectionSchema:
+    def __init__(self, heavy_fields=(), hidden_fields=()):
+        # Heavy fields are left out of the default view, hidden fields are never returned
+        self.heavy_fields = tuple(heavy_fields)
+        self.hidden_fields = tuple(hidden_fields)
+
+    def is_hidden(self, field):
+        return any(field == hidden or field.startswith(f'{hidden}.') for hidden in self.hidden_fields)
+
+    def validate_fields(self, value):
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        if not fields:
+            raise ValidationError("fields must be a comma separated list of field names or *.")
+        for field in fields:
+            if field != '*' and not FIELD_REGEX.match(field):
+                raise ValidationError(f"Invalid field name '{field}'.")
+            # MongoDB rejects a projection with a field and one of its subfields
+            if any(other.startswith(f'{field}.') for other in fields):
+                raise ValidationError(f"'{field}' already includes its subfields.")
+        return list(dict.fromkeys(fields))
+
+    def load_projection(self, args):
+        """Returns the projection of the requested view, None reads every field"""
+        value = args.get('fields')
+        if value is None:
+            excluded = self.heavy_fields + self.hidden_fields
+            return {field: 0 for field in excluded} or None
+
+        fields = self.validate_fields(value)
+        if '*' in fields:
+            return {field: 0 for field in self.hidden_fields} or None
+
+        projection = {field: 1 for field in fields if not self.is_hidden(field)}
+        # _id is always returned, it is the cursor of the next page
+        projection['_id'] = 1
+        return projection
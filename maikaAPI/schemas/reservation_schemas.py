@@ -2,6 +2,9 @@ from datetime import datetime
 from marshmallow import Schema, fields, validates, ValidationError
 import re
 
+# Format of the display date sent by the frontend
+DATE_FORMAT = '%d %b %Y %H:%M'
+
 # Define the schema for reservation validations
 class ReservationSchema(Schema):
     date = fields.String(required=True)
@@ -13,13 +16,18 @@ class ReservationSchema(Schema):
     email = fields.String(required=True)
     special = fields.String(required=False)
 
+    # Parsing the display date into the datetime stored next to it
+    @staticmethod
+    def parse_date(value):
+        try:
+            return datetime.strptime(value, DATE_FORMAT)
+        except (TypeError, ValueError):
+            raise ValidationError("Date must be in the format 'DD MMM YYYY HH:MM'")
+
     # Custom validation for the 'date' field
     @validates('date')
     def validate_date(self, value):
-        try:
-            datetime.strptime(value, '%d %b %Y %H:%M') 
-        except ValueError:
-            raise ValidationError("Date must be in the format 'DD MMM YYYY HH:MM'")
+        self.parse_date(value)
 
     # Custom validation for the 'people' field
     @validates('people')
@@ -66,3 +74,42 @@ class ReservationSchema(Schema):
         email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         if not re.match(email_regex, value):
             raise ValidationError("Invalid email address.")
+
+    # Parsing an ISO 8601 date or datetime of the range query. Reservations are stored in the
+    # restaurant's local time, so a bound with a UTC offset could not be compared with them
+    @staticmethod
+    def parse_iso_date(value, name):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValidationError(f"'{name}' must be an ISO 8601 date or datetime")
+        if parsed.tzinfo is not None:
+            raise ValidationError(f"'{name}' must be a local date or datetime, without a UTC offset")
+        return parsed
+
+    # Day of the availability query
+    def load_availability_date(self, args):
+        value = args.get('date')
+        if not value:
+            raise ValidationError("'date' is required")
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValidationError("'date' must be in the format 'YYYY-MM-DD'")
+
+    # Filters for the reservation list, 'from' is inclusive and 'to' exclusive
+    def load_filters(self, args):
+        filters = {}
+        if args.get('t_reservation'):
+            filters['t_reservation'] = args.get('t_reservation')
+
+        date_range = {}
+        if args.get('from'):
+            date_range['$gte'] = self.parse_iso_date(args.get('from'), 'from')
+        if args.get('to'):
+            date_range['$lt'] = self.parse_iso_date(args.get('to'), 'to')
+        if '$gte' in date_range and '$lt' in date_range and date_range['$gte'] > date_range['$lt']:
+            raise ValidationError("'from' must not be after 'to'")
+        if date_range:
+            filters['date_at'] = date_range
+        return filters
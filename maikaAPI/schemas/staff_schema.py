@@ -1,5 +1,7 @@
 from marshmallow import Schema, fields, validates, ValidationError
 from datetime import datetime
+from schemas.pagination_schema import parse_bool
+from services.image_service import ImageService
 
 
 class StaffSchema(Schema):
@@ -56,6 +58,11 @@ class StaffSchema(Schema):
     def validate_avatar(self, value):
         if not value or not value.strip():
             raise ValidationError("Avatar must be a non-empty base-64 encoded string.")
-        if not value.startswith("data:image/"):
-            raise ValidationError("Avatar must be a valid base-64 image string.")
+        if not ImageService.is_data_uri(value) and not ImageService.is_image_url(value):
+            raise ValidationError("Avatar must be a valid base-64 image string or an image url.")
 
+    def load_filters(self, args):
+        filters = {}
+        if args.get('status') is not None:
+            filters['status'] = parse_bool(args.get('status'), 'status')
+        return filters
@@ -38,3 +38,11 @@ class UserSchema:
         self.validate_name(data.get('name'))
         self.validate_user_type(data.get('userType'))
         return data
+
+    def load_filters(self, args):
+        """Lee los filtros de la lista de usuarios"""
+        filters = {}
+        if args.get('userType') is not None:
+            self.validate_user_type(args.get('userType'))
+            filters['userType'] = args.get('userType')
+        return filters
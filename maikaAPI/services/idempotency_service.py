@@ -0,0 +1,102 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import jsonify, make_response, request
+from pymongo.errors import DuplicateKeyError
+from logger.logger_base import Logger
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+# Service for the Idempotency-Key header: the first request with a key runs, its retries get the stored response
+class IdempotencyService:
+    def __init__(self, db_conn):
+        self.logger = Logger()
+        self.db_conn = db_conn
+        # A key left pending by a crashed worker can be taken over after this long
+        self.pending_timeout = float(os.environ.get('IDEMPOTENCY_PENDING_SECONDS', 30))
+
+    @property
+    def collection(self):
+        return self.db_conn.db.idempotency_keys
+
+    # Claiming a key, returns None for the request that must run or the stored record of an earlier one
+    def claim(self, record_id, request_hash):
+        now = datetime.now(timezone.utc)
+        try:
+            # The unique _id lets a single request win, concurrent retries see its record
+            self.collection.insert_one({'_id': record_id, 'request_hash': request_hash, 'status': 'pending', 'created_at': now})
+            return None
+        except DuplicateKeyError:
+            pass
+
+        record = self.collection.find_one_and_update(
+            {
+                '_id': record_id,
+                'request_hash': request_hash,
+                'status': 'pending',
+                'created_at': {'$lt': now - timedelta(seconds=self.pending_timeout)}
+            },
+            {'$set': {'created_at': now}}
+        )
+        if record:
+            self.logger.warning(f'Taking over the idempotency key {record_id} left pending')
+            return None
+        return self.collection.find_one({'_id': record_id}) or {'request_hash': request_hash, 'status': 'pending'}
+
+    def store(self, record_id, response):
+        self.collection.update_one({'_id': record_id}, {'$set': {
+            'status': 'done',
+            'response': {
+                'status': response.status_code,
+                'body': response.get_data(),
+                'mimetype': response.mimetype
+            }
+        }})
+
+    def release(self, record_id):
+        self.collection.delete_one({'_id': record_id, 'status': 'pending'})
+
+    # Wrapping a route so requests with the same Idempotency-Key only run once
+    def idempotent(self, scope, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return view(*args, **kwargs)
+            if not key or len(key) > 255:
+                return jsonify({'error': f'{IDEMPOTENCY_HEADER} must have between 1 and 255 characters'}), 400
+
+            record_id = f'{scope}:{key}'
+            request_hash = hashlib.sha256(request.get_data()).hexdigest()
+            record = self.claim(record_id, request_hash)
+
+            if record is not None:
+                if record['request_hash'] != request_hash:
+                    return jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'}), 422
+                if record['status'] != 'done':
+                    response = jsonify({'error': 'A request with this key is still in progress'})
+                    response.status_code = 409
+                    response.headers['Retry-After'] = '1'
+                    return response
+                # The stored response is sent as is, validation and writes are not run again
+                stored = record['response']
+                response = make_response(stored['body'], stored['status'])
+                response.mimetype = stored['mimetype']
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                self.release(record_id)
+                raise
+            # Server errors are not kept, the client may retry them
+            if response.status_code >= 500:
+                self.release(record_id)
+            else:
+                self.store(record_id, response)
+            return response
+
+        return wrapper
@@ -0,0 +1,123 @@
+import base64
+import binascii
+import hashlib
+import re
+import gridfs
+from gridfs.errors import NoFile
+from pymongo.errors import DuplicateKeyError
+from logger.logger_base import Logger
+
+DATA_URI_REGEX = re.compile(r'^data:(image/[\w.+-]+);base64,(.*)$', re.DOTALL)
+IMAGE_HASH_REGEX = re.compile(r'^[0-9a-f]{64}$')
+IMAGE_PATH = '/api/v1/images/'
+# Urls written by older versions carry the host, only the path is kept
+IMAGE_URL_REGEX = re.compile(r'^(https?://[^/?#]+)?/api/v1/images/([0-9a-f]{64})$')
+# Uploads of an image that keeps colliding with an incomplete copy before giving up
+UPLOAD_ATTEMPTS = 3
+
+# Service for the content-addressed image store, images are kept once in GridFS keyed by their sha256.
+# Documents keep the path of their image, so a change of host or port doesn't break them
+class ImageService:
+    def __init__(self, db_conn):
+        self.logger = Logger()
+        self.db_conn = db_conn
+
+    @property
+    def bucket(self):
+        return gridfs.GridFSBucket(self.db_conn.db, bucket_name='images')
+
+    @staticmethod
+    def is_data_uri(value):
+        return isinstance(value, str) and value.startswith('data:image/')
+
+    @staticmethod
+    def is_image_url(value):
+        return isinstance(value, str) and IMAGE_URL_REGEX.match(value) is not None
+
+    @staticmethod
+    def image_path(image_hash):
+        return f'{IMAGE_PATH}{image_hash}'
+
+    def image_exists(self, image_hash):
+        return self.db_conn.db['images.files'].find_one({'_id': image_hash}, {'_id': 1}) is not None
+
+    # GridFS writes the file document after the last chunk, an image is complete when it has every chunk
+    def image_complete(self, image_hash):
+        stored = self.db_conn.db['images.files'].find_one({'_id': image_hash}, {'length': 1, 'chunkSize': 1})
+        if stored is None:
+            return False
+        chunks = -(-stored['length'] // stored['chunkSize'])
+        return self.db_conn.db['images.chunks'].count_documents({'files_id': image_hash}) == chunks
+
+    def upload_image(self, image_hash, data, content_type):
+        for _ in range(UPLOAD_ATTEMPTS):
+            try:
+                self.bucket.upload_from_stream_with_id(
+                    image_hash, image_hash, data, metadata={'contentType': content_type}
+                )
+                self.logger.info(f'Stored image {image_hash} ({len(data)} bytes)')
+                return
+            except DuplicateKeyError:
+                # Another request stored the same image first
+                if self.image_complete(image_hash):
+                    return
+                # Chunks left by an upload that failed halfway, the image is written again
+                self.logger.warning(f'Replacing the incomplete upload of image {image_hash}')
+                try:
+                    self.bucket.delete(image_hash)
+                except NoFile:
+                    pass
+        raise RuntimeError(f'Image {image_hash} could not be stored')
+
+    # Decoding a data uri and storing it, returns the image path. Urls must point to a stored image
+    def store_image(self, value):
+        if not self.is_data_uri(value):
+            match = IMAGE_URL_REGEX.match(value) if isinstance(value, str) else None
+            if not match or not self.image_exists(match.group(2)):
+                raise ValueError('Image not found in the image store')
+            return self.image_path(match.group(2))
+
+        match = DATA_URI_REGEX.match(value)
+        if not match:
+            raise ValueError('Image must be a base-64 data uri')
+        content_type = match.group(1)
+        try:
+            data = base64.b64decode(match.group(2), validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError('Image must be a base-64 data uri')
+
+        image_hash = hashlib.sha256(data).hexdigest()
+        if not self.image_exists(image_hash):
+            self.upload_image(image_hash, data, content_type)
+        return self.image_path(image_hash)
+
+    # Getting the bytes and content type of an image
+    def get_image(self, image_hash):
+        if not IMAGE_HASH_REGEX.match(image_hash):
+            return None
+        try:
+            grid_out = self.bucket.open_download_stream(image_hash)
+        except NoFile:
+            return None
+        metadata = grid_out.metadata or {}
+        return grid_out.read(), metadata.get('contentType', 'application/octet-stream')
+
+    # Moving the inline images of a collection into the store and dropping the host of stored urls,
+    # returns the number of documents updated
+    def migrate_inline_images(self, collection, field, batch_size=100):
+        migrated = 0
+        skipped = []
+        while True:
+            query = {field: {'$regex': '^(data:image/|https?://)'}, '_id': {'$nin': skipped}}
+            documents = list(self.db_conn.db[collection].find(query, {field: 1}).limit(batch_size))
+            if not documents:
+                return migrated
+            for document in documents:
+                try:
+                    image_path = self.store_image(document[field])
+                except ValueError as e:
+                    self.logger.warning(f'Skipping invalid image in {collection} {document["_id"]}: {e}')
+                    skipped.append(document['_id'])
+                    continue
+                self.db_conn.db[collection].update_one({'_id': document['_id']}, {'$set': {field: image_path}})
+                migrated += 1
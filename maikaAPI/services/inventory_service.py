@@ -1,32 +1,48 @@
+from datetime import datetime, timezone
 from flask import jsonify
+from pymongo import ReturnDocument, UpdateOne
 from logger.logger_base import Logger
 
 # Service for managing inventory
 class InventoryService:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, sequence_service, image_service):
         self.logger = Logger()
         self.db_conn = db_conn
+        self.sequence_service = sequence_service
+        self.image_service = image_service
 
     # Getting all the inventories
-    def get_all_inventories(self):
+    def get_all_inventories(self, filters=None, after=None, limit=None, stream=False, projection=None):
         try:
-            # Reading
-            inventories = list(self.db_conn.db.inventories.find())
-            return inventories
+            # Reading one page in _id order
+            return self.db_conn.find_page('inventories', filters, after, limit, projection, stream)
         except Exception as e:
             self.logger.error(f'Error fetching all inventories from the database: {e}')
             return jsonify({ 'error': f'Error fetching all inventories from the database: {e}' }), 500
     
+    # Inventories changed and deleted since a sync token
+    def get_changes(self, since, projection=None):
+        try:
+            return self.db_conn.changes_since('inventories', since, projection)
+        except Exception as e:
+            self.logger.error(f'Error fetching the inventory changes from the database: {e}')
+            return jsonify({'error': f'Error fetching the inventory changes from the database: {e}'}), 500
+
     # Adding an inventory
     def add_inventory(self, new_inventory):
         try:
             # Calculating next id
-            last_inventory = self.db_conn.db.inventories.find_one(sort=[('_id', -1)])
-            next_id = (last_inventory['_id'] + 1 if last_inventory else 1)
+            next_id = self.sequence_service.next_id('inventories')
             new_inventory["_id"] = next_id
+            # Storing the image once and keeping only its url
+            new_inventory['image'] = self.image_service.store_image(new_inventory['image'])
+            new_inventory['created_at'] = new_inventory['updated_at'] = datetime.now(timezone.utc)
             # Adding
             self.db_conn.db.inventories.insert_one(new_inventory)
             return new_inventory
+        except ValueError as e:
+            # An image that is not a data uri or a stored image is rejected
+            return str(e)
         except Exception as e:
             self.logger.error(f'Error creating the new inventory: {e}')
             return jsonify({ 'error': f'Error creating the new inventory: {e}' }), 500
@@ -43,49 +59,95 @@ class InventoryService:
     # Updating an inventory
     def update_inventory(self, inventory_id, inventory):
         try:
-            update_inventory = self.get_inventory_by_id(inventory_id)
-
-            if update_inventory:
-                updated_inventory = self.db_conn.db.inventories.update_one({'_id': inventory_id}, {'$set': inventory})
-                if updated_inventory.modified_count > 0:
-                    return inventory
-                else:
-                    return 'The inventory is already up-to-date'
-            else:
-                return None
+            inventory['image'] = self.image_service.store_image(inventory['image'])
+            return self.db_conn.db.inventories.find_one_and_update(
+                {'_id': inventory_id}, {'$set': {**inventory, 'updated_at': datetime.now(timezone.utc)}},
+                return_document=ReturnDocument.AFTER
+            )
+        except ValueError as e:
+            return str(e)
         except Exception as e:
             self.logger.error(f'Error updating the inventory: {e}')
             return jsonify({'error': f'Error updating the inventory: {e}'}), 500
         
     def update_inventory_existence(self, inventory_id, existence):
         try:
-            update_inventory = self.get_inventory_by_id(inventory_id)
-
             # Just update the existence for inventory
-            if update_inventory:
-                updated_inventory = self.db_conn.db.inventories.update_one({'_id': inventory_id}, {'$set': {'existence': existence}})
-                if updated_inventory.modified_count > 0:
-                    self.logger.info("INCIO")
-                    update_inventory["existence"] = existence
-                    return update_inventory
-                else:
-                    return 'The inventory existence is already up-to-date'
-            else:
-                return None
+            return self.db_conn.db.inventories.find_one_and_update(
+                {'_id': inventory_id}, {'$set': {'existence': existence, 'updated_at': datetime.now(timezone.utc)}},
+                return_document=ReturnDocument.AFTER
+            )
         except Exception as e:
             self.logger.error(f'Error updating the inventory existence: {e}')
             return jsonify({'error': f'Error updating the inventory existence: {e}'}), 500
     
+    # Consuming stock atomically, the update only matches when there is enough existence
+    def consume_inventory(self, inventory_id, amount):
+        try:
+            consumed_inventory = self.db_conn.db.inventories.find_one_and_update(
+                {'_id': inventory_id, 'existence': {'$gte': amount}},
+                {'$inc': {'existence': -amount}, '$set': {'updated_at': datetime.now(timezone.utc)}},
+                return_document=ReturnDocument.AFTER
+            )
+            if consumed_inventory:
+                return consumed_inventory
+
+            # Only a rejected update pays for this read, to tell a missing inventory from a short stock
+            if self.db_conn.db.inventories.count_documents({'_id': inventory_id}, limit=1):
+                return 'Insufficient existence'
+            return None
+        except Exception as e:
+            self.logger.error(f'Error consuming the inventory: {e}')
+            return jsonify({'error': f'Error consuming the inventory: {e}'}), 500
+
+    # Applying a batch of stock adjustments in a single bulk write.
+    # A negative delta only applies when the existence covers it, as when consuming
+    def update_inventories_existence(self, adjustments):
+        try:
+            operations = []
+            guarded = []
+            now = datetime.now(timezone.utc)
+            for adjustment in adjustments:
+                if 'existence' in adjustment:
+                    update = {'$set': {'existence': int(adjustment['existence']), 'updated_at': now}}
+                elif adjustment['delta'] < 0:
+                    guarded.append(adjustment)
+                    continue
+                else:
+                    update = {'$inc': {'existence': adjustment['delta']}, '$set': {'updated_at': now}}
+                operations.append(UpdateOne({'_id': adjustment['id']}, update))
+            if operations:
+                self.db_conn.db.inventories.bulk_write(operations, ordered=False)
+
+            # A negative delta only applies when the existence covers it. Each one is its own conditional
+            # update, so a delta is reported as rejected only when its own update did not match
+            unmatched_ids = set()
+            for adjustment in guarded:
+                result = self.db_conn.db.inventories.update_one(
+                    {'_id': adjustment['id'], 'existence': {'$gte': -adjustment['delta']}},
+                    {'$inc': {'existence': adjustment['delta']}, '$set': {'updated_at': now}}
+                )
+                if not result.matched_count:
+                    unmatched_ids.add(adjustment['id'])
+
+            ids = [adjustment['id'] for adjustment in adjustments]
+            inventories = list(self.db_conn.db.inventories.find({'_id': {'$in': ids}}).sort('_id', 1))
+            found_ids = {inventory['_id'] for inventory in inventories}
+            missing_ids = [inventory_id for inventory_id in ids if inventory_id not in found_ids]
+            rejected_ids = [inventory_id for inventory_id in ids if inventory_id in unmatched_ids and inventory_id in found_ids]
+            updated_inventories = [inventory for inventory in inventories if inventory['_id'] not in unmatched_ids]
+            return updated_inventories, missing_ids, rejected_ids
+        except Exception as e:
+            self.logger.error(f'Error updating the inventories existence: {e}')
+            return jsonify({'error': f'Error updating the inventories existence: {e}'}), 500
+
     # Deleting inventory
     def delete_inventory(self, inventory_id):
         try:
-            deleted_inventory = self.get_inventory_by_id(inventory_id)
-
+            deleted_inventory = self.db_conn.db.inventories.find_one_and_delete({'_id': inventory_id})
             if deleted_inventory:
-                self.db_conn.db.inventories.delete_one({'_id': inventory_id})            
-                return deleted_inventory
-            else:
-                return None            
+                self.db_conn.add_tombstone('inventories', inventory_id)
+            return deleted_inventory
         except Exception as e:
             self.logger.error(f'Error deleting the inventory data: {e}')
             return jsonify({'error': f'Error deleting the inventory: {e}'}), 500
@@ -1,27 +1,84 @@
-from flask import jsonify
+import hashlib
+import os
+import time
+from flask import current_app, jsonify
+from pymongo import ReturnDocument
 from logger.logger_base import Logger
 
 class MenuService:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, sequence_service, image_service):
         self.logger = Logger()
         self.db_conn = db_conn
+        self.sequence_service = sequence_service
+        self.image_service = image_service
+        # Serialized menu views of this worker, the shared version document tells when they are stale
+        self.menu_cache = {}
+        self.menu_cache_views = int(os.environ.get('MENU_CACHE_VIEWS', 8))
+        self.menu_version = None
+        self.menu_version_checked_at = 0
+        self.menu_version_ttl = float(os.environ.get('MENU_CACHE_VERSION_TTL', 2))
 
-    def get_all_meals(self):
+    def get_all_meals(self, filters=None, after=None, limit=None, stream=False, projection=None):
         try:
-            meals = list(self.db_conn.db.menu.find())
-            return meals
+            return self.db_conn.find_page('menu', filters, after, limit, projection, stream)
         except Exception as e:
             self.logger.error(f'Error fetching all meals from the database: {e}')
             return jsonify({ 'error': f'Error fetching all meals from the database: {e}' }), 500
-        
+
+    # Reading the menu version shared by every worker, at most once per ttl
+    def get_menu_version(self):
+        now = time.monotonic()
+        if self.menu_version is None or now - self.menu_version_checked_at >= self.menu_version_ttl:
+            counter = self.db_conn.db.cache_versions.find_one({'_id': 'menu'})
+            self.menu_version = counter['version'] if counter else 0
+            self.menu_version_checked_at = now
+        return self.menu_version
+
+    # The view is the ?fields= argument, each one has its own etag
+    def get_menu_etag(self, view=''):
+        etag = f'menu-{self.get_menu_version()}'
+        if view:
+            etag = f'{etag}-{hashlib.sha1(view.encode("utf-8")).hexdigest()[:12]}'
+        return etag
+
+    def get_menu_response(self, view='', projection=None):
+        """Returns the etag and the serialized menu view, the database is only read when the version changed"""
+        etag = self.get_menu_etag(view)
+        cached = self.menu_cache.get(view)
+        if cached and cached['etag'] == etag:
+            return etag, cached['body']
+
+        meals, _ = self.db_conn.find_page('menu', projection=projection)
+        body = current_app.json.dumps_bytes(meals)
+        # Views are chosen by the clients, the cache starts over instead of growing without bound
+        if view not in self.menu_cache and len(self.menu_cache) >= self.menu_cache_views:
+            self.menu_cache = {}
+        self.menu_cache[view] = {'etag': etag, 'body': body}
+        return etag, body
+
+    # Bumping the shared version so every worker drops its cached menu
+    def invalidate_menu(self):
+        counter = self.db_conn.db.cache_versions.find_one_and_update(
+            {'_id': 'menu'},
+            {'$inc': {'version': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.menu_cache = {}
+        self.menu_version = counter['version']
+        self.menu_version_checked_at = time.monotonic()
+
     def add_meal(self, new_meal):
         try:
-            last_meal = self.db_conn.db.menu.find_one(sort=[('_id', -1)])
-            next_id = (last_meal['_id'] + 1 if last_meal else 1)
+            next_id = self.sequence_service.next_id('menu')
             new_meal["_id"] = next_id
+            new_meal['image'] = self.image_service.store_image(new_meal['image'])
             self.db_conn.db.menu.insert_one(new_meal)
+            self.invalidate_menu()
             return new_meal
+        except ValueError as e:
+            # An image that is not a data uri or a stored image is rejected
+            return str(e)
         except Exception as e:
             self.logger.error(f'Error creating the new meal: {e}')
             return jsonify({ 'error': f'Error creating the new meal: {e}' }), 500
-
@@ -0,0 +1,68 @@
+import os
+import time
+from flask import g, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from logger.logger_base import Logger
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUESTS = Counter(
+    'maika_http_requests_total', 'HTTP requests handled', ['blueprint', 'route', 'method', 'status']
+)
+HTTP_ERRORS = Counter(
+    'maika_http_request_errors_total', 'HTTP requests answered with a 5xx status', ['blueprint', 'route', 'method']
+)
+HTTP_LATENCY = Histogram(
+    'maika_http_request_duration_seconds', 'HTTP request latency', ['blueprint', 'route', 'method'],
+    buckets=LATENCY_BUCKETS
+)
+MONGO_COMMANDS = Counter(
+    'maika_mongo_commands_total', 'MongoDB commands issued', ['command', 'collection', 'outcome']
+)
+MONGO_LATENCY = Histogram(
+    'maika_mongo_command_duration_seconds', 'MongoDB command latency', ['command', 'collection'],
+    buckets=LATENCY_BUCKETS
+)
+
+
+# Service for the Prometheus metrics, aggregated across gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set
+class MetricsService:
+    def __init__(self, app=None):
+        self.logger = Logger()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+
+    # Command monitor observer that feeds the MongoDB command metrics
+    def observe_command(self, command_name, collection, duration, outcome):
+        MONGO_COMMANDS.labels(command_name, collection, outcome).inc()
+        MONGO_LATENCY.labels(command_name, collection).observe(duration)
+
+    def start_request(self):
+        g.metrics_started_at = time.perf_counter()
+
+    def finish_request(self, response):
+        if 'metrics_started_at' not in g:
+            return response
+
+        blueprint = request.blueprint or ''
+        # The rule template keeps the label set small, unmatched paths share one label
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUESTS.labels(blueprint, route, request.method, str(response.status_code)).inc()
+        if response.status_code >= 500:
+            HTTP_ERRORS.labels(blueprint, route, request.method).inc()
+        HTTP_LATENCY.labels(blueprint, route, request.method).observe(time.perf_counter() - g.metrics_started_at)
+        return response
+
+    # Rendering the metrics in the text exposition format
+    def render(self):
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry), CONTENT_TYPE_LATEST
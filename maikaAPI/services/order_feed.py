@@ -0,0 +1,132 @@
+import os
+import queue
+import threading
+import time
+from pymongo.errors import OperationFailure, PyMongoError
+from logger.logger_base import Logger
+
+# Change streams need a replica set, a standalone mongod answers with this code
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+# Service that fans out the order changes to the connected displays.
+# One watcher per process reads a change stream, or polls the updated_at watermark
+# when change streams are not available, and copies each event to every subscriber queue
+class OrderFeed:
+    def __init__(self, db_conn):
+        self.logger = Logger()
+        self.db_conn = db_conn
+        self.queue_size = int(os.environ.get('ORDER_FEED_QUEUE_SIZE', 1000))
+        self.poll_interval = float(os.environ.get('ORDER_FEED_POLL_SECONDS', 1))
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.watcher = None
+        self.watcher_pid = None
+        self.change_streams = True
+
+    # Registering a display, events published from now on are queued for it
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            # Threads do not survive a fork, each worker starts its own watcher
+            if self.watcher is None or not self.watcher.is_alive() or self.watcher_pid != os.getpid():
+                self.watcher = threading.Thread(target=self.watch, name='order-feed', daemon=True)
+                self.watcher_pid = os.getpid()
+                self.watcher.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def has_subscribers(self):
+        with self.lock:
+            return bool(self.subscribers)
+
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A display that can't keep up is dropped, it gets a fresh snapshot when it reconnects
+                self.unsubscribe(subscriber)
+                self.reset(subscriber)
+
+    # Replacing the queued events with the reset marker. Only the watcher puts events,
+    # so the emptied queue has room and the watcher never waits on a stalled display
+    def reset(self, subscriber):
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+        subscriber.put_nowait(None)
+
+    # Watcher loop, it stops when the last display leaves
+    def watch(self):
+        while True:
+            # Checked under the lock that subscribe takes, a display arriving now starts a new watcher
+            with self.lock:
+                if not self.subscribers:
+                    self.watcher = None
+                    return
+            try:
+                if self.change_streams:
+                    self.watch_change_stream()
+                else:
+                    self.poll()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    self.logger.warning('Change streams are not available, the order feed polls updated_at instead')
+                    self.change_streams = False
+                else:
+                    self.logger.error(f'Error watching the orders: {e}')
+                    time.sleep(self.poll_interval)
+            except PyMongoError as e:
+                self.logger.error(f'Error watching the orders: {e}')
+                time.sleep(self.poll_interval)
+
+    def watch_change_stream(self):
+        with self.db_conn.db.orders.watch(full_document='updateLookup', max_await_time_ms=1000) as stream:
+            while self.has_subscribers():
+                change = stream.try_next()
+                if change is None:
+                    continue
+                operation = change['operationType']
+                if operation == 'insert':
+                    self.publish({'type': 'insert', 'order': change['fullDocument']})
+                elif operation in ('update', 'replace') and change.get('fullDocument'):
+                    self.publish({'type': 'update', 'order': change['fullDocument']})
+                elif operation == 'delete':
+                    self.publish({'type': 'delete', '_id': change['documentKey']['_id']})
+
+    def poll(self):
+        orders = self.db_conn.db.orders
+        latest = orders.find_one({'updated_at': {'$exists': True}}, {'updated_at': 1}, sort=[('updated_at', -1)])
+        watermark = latest['updated_at'] if latest else None
+        # Orders stamped with the watermark itself were already seen, $gte would send them again
+        seen_at_watermark = {latest['_id']} if latest else set()
+        known_ids = set(orders.distinct('_id'))
+
+        while self.has_subscribers():
+            time.sleep(self.poll_interval)
+
+            query = {'updated_at': {'$gte': watermark}} if watermark else {'updated_at': {'$exists': True}}
+            for order in orders.find(query).sort('updated_at', 1):
+                if order['updated_at'] == watermark and order['_id'] in seen_at_watermark:
+                    continue
+                if order['updated_at'] != watermark:
+                    watermark = order['updated_at']
+                    seen_at_watermark = set()
+                seen_at_watermark.add(order['_id'])
+                self.publish({'type': 'update' if order['_id'] in known_ids else 'insert', 'order': order})
+                known_ids.add(order['_id'])
+
+            # Deletes leave nothing to stamp, they are found by comparing the ids
+            current_ids = set(orders.distinct('_id'))
+            for order_id in sorted(known_ids - current_ids):
+                self.publish({'type': 'delete', '_id': order_id})
+            known_ids = current_ids
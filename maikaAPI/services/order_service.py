@@ -1,25 +1,37 @@
+from datetime import datetime, timezone
 from flask import jsonify
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 from logger.logger_base import Logger
 
 class OrderService:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, sequence_service):
         self.logger = Logger()
         self.db_conn = db_conn
+        self.sequence_service = sequence_service
         
-    def get_all_orders(self):
+    def get_all_orders(self, filters=None, after=None, limit=None, stream=False, projection=None):
         try:
-            orders = list(self.db_conn.db.orders.find())
+            orders, next_cursor = self.db_conn.find_page('orders', filters, after, limit, projection, stream)
             self.logger.info('Successfully fetched all orders from the database.')
-            return orders
+            return orders, next_cursor
         except Exception as e:
             self.logger.error(f'Error fetching all orders from the database: {e}')
             return jsonify({'error': f'Error fetching all orders from the database: {e}'}), 500
             
+    # Orders changed and deleted since a sync token
+    def get_changes(self, since, projection=None):
+        try:
+            return self.db_conn.changes_since('orders', since, projection)
+        except Exception as e:
+            self.logger.error(f'Error fetching the order changes from the database: {e}')
+            return jsonify({'error': f'Error fetching the order changes from the database: {e}'}), 500
+
     def add_order(self, new_order):
         try:
-            last_order = self.db_conn.db.orders.find_one(sort=[('_id', -1)])
-            next_id = (last_order['_id'] + 1 if last_order else 1)
+            next_id = self.sequence_service.next_id('orders')
             new_order["_id"] = next_id
+            new_order['created_at'] = new_order['updated_at'] = datetime.now(timezone.utc)
             self.db_conn.db.orders.insert_one(new_order)
             self.logger.info(f'New order created with ID: {new_order["_id"]}')
             return new_order
@@ -27,6 +39,29 @@ class OrderService:
             self.logger.error(f'Error creating the new order: {e}')
             return jsonify({'error': f'Error creating the new order: {e}'}), 500
             
+    def add_orders(self, new_orders):
+        """Inserts several orders in one round trip, returns the created orders and the errors by index"""
+        try:
+            ids = self.sequence_service.reserve_ids('orders', len(new_orders))
+            now = datetime.now(timezone.utc)
+            for new_order, next_id in zip(new_orders, ids):
+                new_order["_id"] = next_id
+                new_order['created_at'] = new_order['updated_at'] = now
+
+            errors = {}
+            try:
+                self.db_conn.db.orders.insert_many(new_orders, ordered=False)
+            except BulkWriteError as e:
+                for write_error in e.details.get('writeErrors', []):
+                    errors[write_error['index']] = write_error['errmsg']
+
+            created_orders = [order for index, order in enumerate(new_orders) if index not in errors]
+            self.logger.info(f'{len(created_orders)} orders created in bulk, {len(errors)} failed')
+            return created_orders, errors
+        except Exception as e:
+            self.logger.error(f'Error creating the new orders: {e}')
+            return jsonify({'error': f'Error creating the new orders: {e}'}), 500
+
     def get_order_by_id(self, order_id):
         try:
             order = self.db_conn.db.orders.find_one({'_id': order_id})
@@ -41,15 +76,13 @@ class OrderService:
             
     def update_order(self, order_id, order):
         try:
-            update_order = self.get_order_by_id(order_id)
-            if update_order:
-                updated_order = self.db_conn.db.orders.update_one({'_id': order_id}, {'$set': order})
-                if updated_order.modified_count > 0:
-                    self.logger.info(f'Order with ID {order_id} updated successfully.')
-                    return updated_order
-                else:
-                    self.logger.info(f'Order with ID {order_id} is already up-to-date.')
-                    return 'The order is already up-to-date'
+            updated_order = self.db_conn.db.orders.find_one_and_update(
+                {'_id': order_id}, {'$set': {**order, 'updated_at': datetime.now(timezone.utc)}},
+                return_document=ReturnDocument.AFTER
+            )
+            if updated_order:
+                self.logger.info(f'Order with ID {order_id} updated successfully.')
+                return updated_order
             else:
                 self.logger.warning(f'Order with ID {order_id} not found for update.')
                 return None
@@ -59,9 +92,9 @@ class OrderService:
             
     def delete_order(self, order_id):
         try:
-            deleted_order = self.get_order_by_id(order_id)
+            deleted_order = self.db_conn.db.orders.find_one_and_delete({'_id': order_id})
             if deleted_order:
-                self.db_conn.db.orders.delete_one({'_id': order_id})
+                self.db_conn.add_tombstone('orders', order_id)
                 self.logger.info(f'Order with ID {order_id} deleted successfully.')
                 return deleted_order
             else:
@@ -1,50 +1,200 @@
+import os
+from datetime import datetime, timedelta, timezone
 from flask import jsonify
+from pymongo import ReturnDocument
 from logger.logger_base import Logger
 
+ORDER_NOT_FOUND = 'Order not found'
+# Estado de una orden apartada por un cobro, cuando no hay transacciones
+PAYING_STATUS = 'paying'
+# Estado con el que se crean las órdenes
+PENDING_STATUS = 'pending'
+# Diferencia aceptada entre el total enviado y el calculado, por redondeo
+TOTAL_TOLERANCE = 0.01
+
+
+class CheckoutError(Exception):
+    pass
+
+
 class PaymentService:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, sequence_service):
         self.logger = Logger()
         self.db_conn = db_conn
+        self.sequence_service = sequence_service
+        self.transactions = None
+        self.claim_timeout = float(os.environ.get('CHECKOUT_CLAIM_TIMEOUT_SECONDS', 60))
 
-    def get_all_orders_to_pay(self):
+    def get_all_orders_to_pay(self, table=None):
+        """
+        Obtiene las órdenes pendientes de pago con su total calculado en la base de datos.
+        """
         try:
-            orders = list(self.db_conn.db.orders.find())
-            for order in orders:
-                total = 0
-                for dish in order["dishes"]:
-                    total += dish["price"] * dish["quantity"]
-                order["total"] = total
-            return orders
+            pipeline = []
+            if table is not None:
+                pipeline.append({'$match': {'table': table}})
+            pipeline.append({'$project': {
+                'name': 1,
+                'table': 1,
+                'status': 1,
+                'time': 1,
+                'dishes': {'$map': {
+                    'input': '$dishes',
+                    'as': 'dish',
+                    'in': {'name': '$$dish.name', 'price': '$$dish.price', 'quantity': '$$dish.quantity'}
+                }},
+                'total': {'$sum': {'$map': {
+                    'input': '$dishes',
+                    'as': 'dish',
+                    'in': {'$multiply': ['$$dish.price', '$$dish.quantity']}
+                }}}
+            }})
+            pipeline.append({'$sort': {'_id': 1}})
+            return list(self.db_conn.db.orders.aggregate(pipeline))
         except Exception as e:
             self.logger.error(f'Error fetching all orders to pay from the database: {e}')
             return jsonify({'error': f'Error fetching all orders to pay from the database: {e}'}), 500
 
-    def get_all_payments(self):
+    def get_all_payments(self, filters=None, after=None, limit=None, stream=False, projection=None):
         """
-        Obtiene todas las órdenes almacenadas en la base de datos.
+        Obtiene una página de los pagos almacenados en la base de datos, por defecto solo los activos.
         """
         try:
-            payments = list(self.db_conn.db.payments.find({"active": True}))
-            return payments
+            query = {'active': True}
+            query.update(filters or {})
+            return self.db_conn.find_page('payments', query, after, limit, projection, stream)
         except Exception as e:
             self.logger.error(f'Error fetching all payments from the database: {e}')
             return jsonify({'error': f'Error fetching all payments from the database: {e}'}), 500
 
+    def supports_transactions(self):
+        """
+        Indica si el servidor acepta transacciones (replica set o cluster), se consulta una sola vez.
+        """
+        if self.transactions is None:
+            hello = self.db_conn.client.admin.command('hello')
+            self.transactions = 'setName' in hello or hello.get('msg') == 'isdbgrid'
+        return self.transactions
+
+    @staticmethod
+    def order_total(order):
+        """
+        Calcula el total de una orden con sus platillos guardados.
+        """
+        return round(sum(dish['price'] * dish['quantity'] for dish in order.get('dishes', [])), 2)
+
+    def build_payment(self, payment_id, order, new_payment, now):
+        """
+        Arma el pago con los datos guardados de la orden, solo el rfc y el tipo de pago vienen del cliente.
+        Lanza un CheckoutError si el total enviado no coincide con el de la orden.
+        """
+        total = self.order_total(order)
+        if abs(total - new_payment['total']) > TOTAL_TOLERANCE:
+            raise CheckoutError(f'The total does not match the order, expected {total}')
+        return {
+            '_id': payment_id,
+            'name': order.get('name'),
+            'table': order.get('table'),
+            'dishes': order.get('dishes'),
+            'rfc': new_payment['rfc'],
+            'payment_type': new_payment['payment_type'],
+            'order_id': order['_id'],
+            'total': total,
+            'active': True,
+            'created_at': now
+        }
+
+    def checkout_in_transaction(self, payment_id, new_payment):
+        """
+        Cobra la orden en una transacción: la orden se borra y el pago se guarda juntos o ninguno.
+        with_transaction reintenta los errores transitorios y el commit.
+        """
+        def callback(session):
+            order = self.db_conn.db.orders.find_one_and_delete({'_id': new_payment['order_id']}, session=session)
+            if order is None:
+                raise CheckoutError(ORDER_NOT_FOUND)
+            payment = self.build_payment(payment_id, order, new_payment, datetime.now(timezone.utc))
+            self.db_conn.db.payments.insert_one(payment, session=session)
+            self.db_conn.add_tombstone('orders', order['_id'], session=session)
+            return payment
+
+        with self.db_conn.client.start_session() as session:
+            return session.with_transaction(callback)
+
+    def checkout_with_claim(self, payment_id, new_payment):
+        """
+        Cobra la orden sin transacciones: primero se aparta la orden cambiando su estado,
+        así dos cobros de la misma orden no pueden crear dos pagos.
+        """
+        orders = self.db_conn.db.orders
+        order_id = new_payment['order_id']
+        now = datetime.now(timezone.utc)
+
+        # Un cobro que quedó a medias se puede retomar después de un tiempo
+        previous = orders.find_one_and_update(
+            {'_id': order_id, '$or': [
+                {'status': {'$ne': PAYING_STATUS}},
+                {'paying_at': {'$lt': now - timedelta(seconds=self.claim_timeout)}}
+            ]},
+            {'$set': {'status': PAYING_STATUS, 'payment_id': payment_id, 'paying_at': now, 'updated_at': now}},
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous is None:
+            if orders.count_documents({'_id': order_id}, limit=1):
+                raise CheckoutError('The order is already being paid')
+            raise CheckoutError(ORDER_NOT_FOUND)
+
+        # El cobro anterior alcanzó a guardar su pago, solo faltaba quitar la orden
+        if previous.get('status') == PAYING_STATUS:
+            payment = self.db_conn.db.payments.find_one({'_id': previous.get('payment_id')})
+            if payment:
+                self.remove_paid_order(order_id, payment_id)
+                return payment
+
+        try:
+            payment = self.build_payment(payment_id, previous, new_payment, now)
+        except CheckoutError:
+            self.release_order(order_id, payment_id, previous.get('status'), now)
+            raise
+
+        self.db_conn.db.payments.insert_one(payment)
+        self.remove_paid_order(order_id, payment_id)
+        return payment
+
+    def release_order(self, order_id, payment_id, status, now):
+        """
+        Libera una orden apartada por un cobro rechazado. Una orden tomada de un cobro abandonado
+        vuelve a quedar pendiente, con 'paying' y sin paying_at ningún cobro podría apartarla otra vez.
+        """
+        if status == PAYING_STATUS:
+            status = PENDING_STATUS
+        restore = {'$set': {'updated_at': now}, '$unset': {'payment_id': '', 'paying_at': ''}}
+        if status is None:
+            restore['$unset']['status'] = ''
+        else:
+            restore['$set']['status'] = status
+        self.db_conn.db.orders.update_one({'_id': order_id, 'payment_id': payment_id}, restore)
+
+    def remove_paid_order(self, order_id, payment_id):
+        if self.db_conn.db.orders.delete_one({'_id': order_id, 'payment_id': payment_id}).deleted_count:
+            self.db_conn.add_tombstone('orders', order_id)
+
     def add_payment(self, new_payment):
         """
-        Añade un nuevo pago a la base de datos.
+        Cobra una orden: guarda el pago y quita la orden de las pendientes.
+        Regresa el pago, o un mensaje de error si la orden no existe, ya se está cobrando o el total no coincide.
         """
         try:
-            self.logger.info("INICIO")
-            self.logger.info(new_payment["order_id"])
-            self.logger.info("INICIO 2")
-            last_book = self.db_conn.db.payments.find_one(sort=[('_id', -1)])
-            next_id = (last_book['_id'] + 1 if last_book else 1)
-            new_payment['_id'] = next_id
-            new_payment['active'] = True
-            self.db_conn.db.payments.insert_one(new_payment)
-            self.db_conn.db.orders.delete_one({'_id': new_payment['order_id']})    
-            return new_payment
+            payment_id = self.sequence_service.next_id('payments')
+            if self.supports_transactions():
+                payment = self.checkout_in_transaction(payment_id, new_payment)
+            else:
+                payment = self.checkout_with_claim(payment_id, new_payment)
+            self.logger.info(f'New payment created with ID: {payment["_id"]} for order {new_payment["order_id"]}')
+            return payment
+        except CheckoutError as e:
+            self.logger.warning(f'Checkout of order {new_payment["order_id"]} rejected: {e}')
+            return str(e)
         except Exception as e:
             self.logger.error(f'Error creating the new payment: {e}')
             return jsonify({'error': f'Error creating the new payment: {e}'}), 500
@@ -55,9 +205,8 @@ class PaymentService:
         """
         try:
             payment_id =int(payment_id)
-            self.logger.info(type(payment_id))
             payment = self.db_conn.db.payments.find_one({'_id': payment_id})
-            self.logger.info(payment)
+            self.logger.debug(f'Payment {payment_id} fetched: {payment is not None}')
             return payment
         except Exception as e:
             self.logger.error(f'Error fetching the payment by id from the database: {e}')
@@ -68,21 +217,12 @@ class PaymentService:
         Elimina un pago por su ID.
         """
         try:
-            payment_id = int(payment_id)
-            existing_payment = self.get_payment_by_id(payment_id)
-
-            if existing_payment:
-                if existing_payment["active"]:
-                    result = self.db_conn.db.payments.update_one({'_id': payment_id}, {'$set': {"active": False}})    #Libro actualizado
-                    if result.modified_count > 0: 
-                            existing_payment["active"] = False
-                            return existing_payment
-                    else:
-                        return None
-                else:
-                    return None
-            else:
-                return None
+            # Solo un pago activo puede desactivarse, en una sola operación atómica
+            return self.db_conn.db.payments.find_one_and_update(
+                {'_id': int(payment_id), 'active': True},
+                {'$set': {'active': False}},
+                return_document=ReturnDocument.AFTER
+            )
         except Exception as e:
             self.logger.error(f'Error deleting the payment: {e}')
             return jsonify({'error': f'Error deleting the payment: {e}'}), 500
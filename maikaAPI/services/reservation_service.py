@@ -1,27 +1,72 @@
+from datetime import datetime, timezone
 from flask import jsonify
+from marshmallow import ValidationError
+from pymongo import ReturnDocument, UpdateOne
 from logger.logger_base import Logger
+from schemas.reservation_schemas import ReservationSchema
+
+# Times an update is retried when the reservation changes while its covers are moved
+UPDATE_ATTEMPTS = 5
 
 class ReservationService:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, sequence_service, slot_service):
         self.logger = Logger()
         self.db_conn = db_conn
+        self.sequence_service = sequence_service
+        self.slot_service = slot_service
+
+    # date_at is the restaurant's wall-clock time, stored as a date without a zone. The client reads
+    # every date as UTC, so the zone is dropped again and the time is sent as the local time it is
+    @staticmethod
+    def local_time(reservation):
+        if reservation and isinstance(reservation.get('date_at'), datetime):
+            reservation['date_at'] = reservation['date_at'].replace(tzinfo=None)
+        return reservation
 
     # Get all servervations
-    def get_all_reservations(self):
+    def get_all_reservations(self, filters=None, after=None, limit=None, stream=False, projection=None, sort_field=None):
         try:
-            reservations = list(self.db_conn.db.reservations.find())
-            return reservations
+            reservations, next_cursor = self.db_conn.find_page('reservations', filters, after, limit, projection, stream, sort_field)
+            if stream:
+                return map(self.local_time, reservations), None
+            if isinstance(next_cursor, tuple):
+                next_cursor = (next_cursor[0].replace(tzinfo=None), next_cursor[1])
+            return [self.local_time(reservation) for reservation in reservations], next_cursor
         except Exception as e:
             self.logger.error(f'Error fetching all reservations from the database: {e}')
             return jsonify({ 'error': f'Error fetching all reservations from the database: {e}' }), 500
     
-    # New reservation
+    # Reservations changed and deleted since a sync token
+    def get_changes(self, since, projection=None):
+        try:
+            changed, deleted = self.db_conn.changes_since('reservations', since, projection)
+            return [self.local_time(reservation) for reservation in changed], deleted
+        except Exception as e:
+            self.logger.error(f'Error fetching the reservation changes from the database: {e}')
+            return jsonify({'error': f'Error fetching the reservation changes from the database: {e}'}), 500
+
+    # Giving back the covers of a stored reservation
+    def release_slots(self, reservation):
+        if not reservation.get('date_at'):
+            return
+        try:
+            self.slot_service.release(reservation['date_at'], reservation['people'])
+        except ValueError:
+            pass
+
+    # New reservation, the covers are taken before it is stored
     def add_reservation(self, new_reservation):
         try:
-            last_reservation = self.db_conn.db.reservations.find_one(sort=[('_id', -1)])
-            next_id = (last_reservation['_id'] + 1 if last_reservation else 1)
-            new_reservation["_id"] = next_id
-            self.db_conn.db.reservations.insert_one(new_reservation)
+            if not self.slot_service.book(new_reservation['date_at'], new_reservation['people']):
+                return 'No availability'
+            try:
+                next_id = self.sequence_service.next_id('reservations')
+                new_reservation["_id"] = next_id
+                new_reservation['created_at'] = new_reservation['updated_at'] = datetime.now(timezone.utc)
+                self.db_conn.db.reservations.insert_one(new_reservation)
+            except Exception:
+                self.release_slots(new_reservation)
+                raise
             return new_reservation
         except Exception as e:
             self.logger.error(f'Error creating the new reservation: {e}')
@@ -31,7 +76,7 @@ class ReservationService:
     def get_reservation_by_id(self, reservation_id):
         try:
             reservation = self.db_conn.db.reservations.find_one({'_id': reservation_id})
-            return reservation
+            return self.local_time(reservation)
         except Exception as e:
             self.logger.error(f'Error fetching the reservation id from the database: {e}')
             return jsonify({'error': f'Error fetching the reservation id from the database: {e}'}), 500
@@ -39,16 +84,37 @@ class ReservationService:
     # Update a reservation by id
     def update_reservation(self, reservation_id, reservation):
         try:
-            update_reservation = self.get_reservation_by_id(reservation_id)
+            changes = {**reservation, 'updated_at': datetime.now(timezone.utc)}
+            # Most edits keep the time and party size, they touch no covers
+            updated_reservation = self.db_conn.db.reservations.find_one_and_update(
+                {'_id': reservation_id, 'date_at': reservation['date_at'], 'people': int(reservation['people'])},
+                {'$set': changes}, return_document=ReturnDocument.AFTER
+            )
+            if updated_reservation:
+                return self.local_time(updated_reservation)
+
+            for _ in range(UPDATE_ATTEMPTS):
+                previous = self.db_conn.db.reservations.find_one({'_id': reservation_id}, {'date_at': 1, 'people': 1})
+                if previous is None:
+                    return None
+                previous_date_at = self.local_time(dict(previous)).get('date_at')
 
-            if update_reservation:
-                updated_reservation = self.db_conn.db.reservations.update_one({'_id': reservation_id}, {'$set': reservation})
-                if updated_reservation.modified_count > 0:
-                    return reservation
-                else:
-                    return 'The reservation is already up-to-date'
-            else:
-                return None
+                # Each slot only changes by the difference with the covers the reservation already holds
+                if not self.slot_service.move(previous_date_at, previous.get('people'), reservation['date_at'], reservation['people']):
+                    return 'No availability'
+                try:
+                    # The covers were moved from these values, the update misses if the reservation changed since
+                    updated_reservation = self.db_conn.db.reservations.find_one_and_update(
+                        {'_id': reservation_id, 'date_at': previous.get('date_at'), 'people': previous.get('people')},
+                        {'$set': changes}, return_document=ReturnDocument.AFTER
+                    )
+                except Exception:
+                    self.slot_service.move(reservation['date_at'], reservation['people'], previous_date_at, previous.get('people'), guard=False)
+                    raise
+                if updated_reservation:
+                    return self.local_time(updated_reservation)
+                self.slot_service.move(reservation['date_at'], reservation['people'], previous_date_at, previous.get('people'), guard=False)
+            raise RuntimeError('the reservation kept changing during the update')
         except Exception as e:
             self.logger.error(f'Error updating the reservation: {e}')
             return jsonify({'error': f'Error updating the reservation: {e}'}), 500
@@ -56,15 +122,41 @@ class ReservationService:
     # Delete a reservation by id
     def delete_reservation(self, reservation_id):
         try:
-            deleted_reservation = self.get_reservation_by_id(reservation_id)
-
+            deleted_reservation = self.db_conn.db.reservations.find_one_and_delete({'_id': reservation_id})
             if deleted_reservation:
-                self.db_conn.db.reservations.delete_one({'_id': reservation_id})            
-                return deleted_reservation
-            else:
-                return None            
+                self.release_slots(deleted_reservation)
+                self.db_conn.add_tombstone('reservations', reservation_id)
+            return self.local_time(deleted_reservation)
         except Exception as e:
             self.logger.error(f'Error deleting the reservation data: {e}')
             return jsonify({'error': f'Error deleting the reservation: {e}'}), 500
 
+    # Covers left per slot of a day
+    def get_availability(self, day):
+        try:
+            return self.slot_service.availability(day)
+        except Exception as e:
+            self.logger.error(f'Error fetching the availability from the database: {e}')
+            return jsonify({'error': f'Error fetching the availability from the database: {e}'}), 500
+
+    # Storing the datetime of the reservations saved before date_at existed, returns the number updated
+    def backfill_dates(self, batch_size=500):
+        updated = 0
+        skipped = []
+        while True:
+            query = {'date_at': {'$exists': False}, '_id': {'$nin': skipped}}
+            reservations = list(self.db_conn.db.reservations.find(query, {'date': 1}).limit(batch_size))
+            if not reservations:
+                return updated
 
+            requests = []
+            for reservation in reservations:
+                try:
+                    date_at = ReservationSchema.parse_date(reservation.get('date'))
+                except ValidationError:
+                    self.logger.warning(f'Skipping reservation {reservation["_id"]} with invalid date {reservation.get("date")!r}')
+                    skipped.append(reservation['_id'])
+                    continue
+                requests.append(UpdateOne({'_id': reservation['_id']}, {'$set': {'date_at': date_at}}))
+            if requests:
+                updated += self.db_conn.db.reservations.bulk_write(requests, ordered=False).modified_count
@@ -0,0 +1,72 @@
+import os
+import threading
+from pymongo import ReturnDocument
+from logger.logger_base import Logger
+
+# Service for allocating integer ids from the counters collection
+class SequenceService:
+    def __init__(self, db_conn, block_size=None):
+        self.logger = Logger()
+        self.db_conn = db_conn
+        # With a block size above 1 each worker leases a range of ids and hands them out from memory
+        self.block_size = block_size or int(os.environ.get('MONGODB_ID_BLOCK_SIZE', 1))
+        self.seeded = set()
+        self.blocks = {}
+        self.lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        # A leased block must never be handed out by two processes
+        self.seeded = set()
+        self.blocks = {}
+        self.lock = threading.Lock()
+
+    # Starting the counter after the highest id already stored, so existing collections keep working
+    def _seed(self, name):
+        if name in self.seeded:
+            return
+        last_document = self.db_conn.db[name].find_one(sort=[('_id', -1)], projection={'_id': 1})
+        last_id = last_document['_id'] if last_document and isinstance(last_document['_id'], int) else 0
+        self.db_conn.db.counters.update_one({'_id': name}, {'$max': {'seq': last_id}}, upsert=True)
+        self.seeded.add(name)
+
+    # Reserving count consecutive ids in a single atomic round trip, returns the first one
+    def _increment(self, name, count):
+        self._seed(name)
+        counter = self.db_conn.db.counters.find_one_and_update(
+            {'_id': name},
+            {'$inc': {'seq': count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter['seq'] - count + 1
+
+    # Getting the next id for a collection
+    def next_id(self, name):
+        return self.reserve_ids(name, 1)[0]
+
+    # Getting count ids for a collection, they are unique but not necessarily consecutive
+    def reserve_ids(self, name, count):
+        if count < 1:
+            return []
+
+        # The counter update is atomic on its own, only the leased blocks need the lock
+        if self.block_size <= 1:
+            first_id = self._increment(name, count)
+            return list(range(first_id, first_id + count))
+
+        with self.lock:
+            ids = []
+            next_id, end_id = self.blocks.get(name, (0, 0))
+            while len(ids) < count:
+                if next_id >= end_id:
+                    lease = max(self.block_size, count - len(ids))
+                    next_id = self._increment(name, lease)
+                    end_id = next_id + lease
+                    self.logger.debug(f'Leased ids {next_id} to {end_id - 1} for {name}')
+                take = min(count - len(ids), end_id - next_id)
+                ids.extend(range(next_id, next_id + take))
+                next_id += take
+            self.blocks[name] = (next_id, end_id)
+            return ids
@@ -0,0 +1,164 @@
+import os
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+from logger.logger_base import Logger
+
+# Service for the reservation capacity, one document per day with the covers left in each slot
+class ReservationSlotService:
+    def __init__(self, db_conn):
+        self.logger = Logger()
+        self.db_conn = db_conn
+        self.slot_minutes = int(os.environ.get('RESERVATION_SLOT_MINUTES', 15))
+        self.covers = int(os.environ.get('RESERVATION_SLOT_COVERS', 40))
+        self.max_party = int(os.environ.get('RESERVATION_MAX_PARTY', 12))
+        self.duration_minutes = int(os.environ.get('RESERVATION_DURATION_MINUTES', 90))
+        self.opens = os.environ.get('RESERVATION_OPENS', '12:00')
+        self.closes = os.environ.get('RESERVATION_CLOSES', '23:00')
+
+    @property
+    def collection(self):
+        return self.db_conn.db.reservation_slots
+
+    # Start time of every slot of a day, as 'HH:MM'
+    def day_slots(self):
+        start = datetime.strptime(self.opens, '%H:%M')
+        end = datetime.strptime(self.closes, '%H:%M')
+        slots = []
+        while start < end:
+            slots.append(start.strftime('%H:%M'))
+            start += timedelta(minutes=self.slot_minutes)
+        return slots
+
+    # Day key and slots taken by a reservation, it holds its table for the whole duration
+    def slots_for(self, date_at):
+        arrival = date_at.replace(
+            minute=date_at.minute - date_at.minute % self.slot_minutes, second=0, microsecond=0
+        )
+        day_slots = self.day_slots()
+        if arrival.strftime('%H:%M') not in day_slots:
+            raise ValueError(f'Reservations are taken from {self.opens} to {self.closes}')
+
+        slots = []
+        for minutes in range(0, max(self.duration_minutes, self.slot_minutes), self.slot_minutes):
+            slot = (arrival + timedelta(minutes=minutes)).strftime('%H:%M')
+            if slot in day_slots:
+                slots.append(slot)
+        return arrival.strftime('%Y-%m-%d'), slots
+
+    # Checking that a reservation can be booked at all, before touching the counters
+    def validate_booking(self, date_at, people):
+        if int(people) > self.max_party:
+            raise ValueError(f'Parties of more than {self.max_party} people must call the restaurant')
+        self.slots_for(date_at)
+
+    def _new_day(self, day, remaining=None):
+        return {
+            '_id': day,
+            'capacity': self.covers,
+            'remaining': remaining or {slot: self.covers for slot in self.day_slots()}
+        }
+
+    # Creating the counters of a day on its first booking, returns True when they were created
+    def ensure_day(self, day):
+        result = self.collection.update_one({'_id': day}, {'$setOnInsert': self._new_day(day)}, upsert=True)
+        return result.upserted_id is not None
+
+    # Covers taken per day and slot by a reservation, nothing for one without a date
+    def covers_for(self, date_at, people):
+        if not date_at:
+            return {}
+        day, slots = self.slots_for(date_at)
+        return {day: {slot: int(people) for slot in slots}}
+
+    # Applying the covers taken (positive) or given back (negative) in the slots of a day in one update.
+    # Only the slots that lose covers are guarded, returns False when one of them is full
+    def apply(self, day, changes, guard=True):
+        query = {'_id': day}
+        if guard:
+            query.update({f'remaining.{slot}': {'$gte': taken} for slot, taken in changes.items() if taken > 0})
+        update = {'$inc': {f'remaining.{slot}': -taken for slot, taken in changes.items()}}
+
+        if self.collection.update_one(query, update).modified_count:
+            return True
+        # A day without counters has nothing to give back
+        if all(taken <= 0 for taken in changes.values()):
+            return True
+        # Only the first booking of a day pays for creating its counters. The day may have been
+        # created by a concurrent booking in between, so the update is retried either way
+        self.ensure_day(day)
+        return bool(self.collection.update_one(query, update).modified_count)
+
+    # Moving the covers of a reservation, each slot only changes by the difference between the new and
+    # the previous covers. Returns False, without changing any counter, when a slot is full
+    def move(self, previous_date_at, previous_people, date_at, people, guard=True):
+        try:
+            released = self.covers_for(previous_date_at, previous_people)
+        except ValueError:
+            released = {}
+        taken = self.covers_for(date_at, people)
+
+        changes = {}
+        for day in taken.keys() | released.keys():
+            slots = taken.get(day, {}).keys() | released.get(day, {}).keys()
+            day_changes = {slot: taken.get(day, {}).get(slot, 0) - released.get(day, {}).get(slot, 0) for slot in slots}
+            day_changes = {slot: change for slot, change in day_changes.items() if change}
+            if day_changes:
+                changes[day] = day_changes
+
+        # The days that lose covers go first, a full one leaves nothing to undo
+        applied = []
+        for day in sorted(changes, key=lambda day: not any(change > 0 for change in changes[day].values())):
+            if not self.apply(day, changes[day], guard):
+                for applied_day in applied:
+                    self.apply(applied_day, {slot: -change for slot, change in changes[applied_day].items()}, guard=False)
+                return False
+            applied.append(day)
+        return True
+
+    # Taking the covers of every slot in one conditional update, returns False when a slot is full
+    def book(self, date_at, people):
+        return self.move(None, 0, date_at, people)
+
+    # Giving back the covers of a reservation
+    def release(self, date_at, people):
+        self.move(date_at, people, None, 0)
+
+    # Covers left per slot of a day, answered from its counters document
+    def availability(self, day):
+        day_key = day.strftime('%Y-%m-%d')
+        document = self.collection.find_one({'_id': day_key}) or self._new_day(day_key)
+        remaining = document['remaining']
+        day_slots = sorted(remaining)
+
+        window = max(self.duration_minutes // self.slot_minutes, 1)
+        slots = []
+        for index, slot in enumerate(day_slots):
+            # The largest party that can arrive at this slot and stay for the whole duration
+            party = min(remaining[next_slot] for next_slot in day_slots[index:index + window])
+            slots.append({'time': slot, 'remaining': remaining[slot], 'bookable': max(min(party, self.max_party), 0)})
+        return {'date': day_key, 'capacity': document['capacity'], 'max_party': self.max_party, 'slots': slots}
+
+    # Recomputing the counters of some days from the stored reservations, returns the number of days written
+    def rebuild_days(self, first_day, days=1):
+        requests = []
+        for offset in range(days):
+            day = datetime.combine(first_day, datetime.min.time()) + timedelta(days=offset)
+            day_key = day.strftime('%Y-%m-%d')
+            remaining = {slot: self.covers for slot in self.day_slots()}
+
+            reservations = self.db_conn.db.reservations.find(
+                {'date_at': {'$gte': day, '$lt': day + timedelta(days=1)}}, {'date_at': 1, 'people': 1}
+            )
+            for reservation in reservations:
+                try:
+                    _, slots = self.slots_for(reservation['date_at'])
+                except ValueError:
+                    self.logger.warning(f'Reservation {reservation["_id"]} is outside of the opening hours')
+                    continue
+                for slot in slots:
+                    remaining[slot] -= int(reservation['people'])
+
+            requests.append(ReplaceOne({'_id': day_key}, self._new_day(day_key, remaining), upsert=True))
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+        return len(requests)
@@ -1,26 +1,31 @@
 from flask import jsonify
+from pymongo import ReturnDocument
 from logger.logger_base import Logger
 
 class StaffService:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, sequence_service, image_service):
         self.logger = Logger()
         self.db_conn = db_conn
+        self.sequence_service = sequence_service
+        self.image_service = image_service
 
-    def get_all_employees(self):
+    def get_all_employees(self, filters=None, after=None, limit=None, stream=False, projection=None):
         try:
-            staff = list(self.db_conn.db.staff.find())
-            return staff
+            return self.db_conn.find_page('staff', filters, after, limit, projection, stream)
         except Exception as e:
             self.logger.error(f'Error fetching staff from the database: {e}')
             return jsonify({ 'error': f'Error fetching staff from the database: {e}' }), 500
         
     def add_employee(self, new_employee):
         try:
-            last_employee = self.db_conn.db.staff.find_one(sort=[('_id', -1)])
-            next_id = (last_employee['_id'] + 1 if last_employee else 1)
+            next_id = self.sequence_service.next_id('staff')
             new_employee["_id"] = next_id
+            new_employee['avatar'] = self.image_service.store_image(new_employee['avatar'])
             self.db_conn.db.staff.insert_one(new_employee)
             return new_employee
+        except ValueError as e:
+            # An avatar that is not a data uri or a stored image is rejected
+            return str(e)
         except Exception as e:
             return jsonify({'error': f'Error creating the new employee: {e}'}), 500
         
@@ -34,16 +39,12 @@ class StaffService:
         
     def update_employee(self, employee_id, employee):
         try:
-            update_employee = self.get_employee_by_id(employee_id)
-
-            if update_employee:
-                updated_employee = self.db_conn.db.staff.update_one({'_id': employee_id}, {'$set': employee})
-                if updated_employee.modified_count > 0:
-                    return employee
-                else:
-                    return 'The employee is already up-to-date'
-            else:
-                return None
+            employee['avatar'] = self.image_service.store_image(employee['avatar'])
+            return self.db_conn.db.staff.find_one_and_update(
+                {'_id': employee_id}, {'$set': employee}, return_document=ReturnDocument.AFTER
+            )
+        except ValueError as e:
+            return str(e)
         except Exception as e:
             self.logger.error(f'Error updating the employee: {e}')
             return jsonify({'error': f'Error updating the employee: {e}'}), 500
@@ -52,13 +53,7 @@ class StaffService:
         
     def delete_employee(self, employee_id):
         try:
-            deleted_employee = self.get_employee_by_id(employee_id)
-
-            if deleted_employee:
-                self.db_conn.db.staff.delete_one({'_id': employee_id})            
-                return deleted_employee
-            else:
-                return None            
+            return self.db_conn.db.staff.find_one_and_delete({'_id': employee_id})
         except Exception as e:
             self.logger.error(f'Error deleting the employee data: {e}')
             return jsonify({'error': f'Error deleting the employee: {e}'}), 500
@@ -1,28 +1,36 @@
 from flask import jsonify
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from logger.logger_base import Logger
 
+USERNAME_TAKEN = 'Username already exists'
+
 class UserService:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, sequence_service):
         self.logger = Logger()
         self.db_conn = db_conn
+        self.sequence_service = sequence_service
 
-    def get_all_users(self):
+    def get_all_users(self, filters=None, after=None, limit=None, stream=False, projection=None):
         try:
-            users = list(self.db_conn.db.users.find({}, {'_id': 0}))
+            users, next_cursor = self.db_conn.find_page('users', filters, after, limit, projection, stream)
             self.logger.info('Successfully fetched all users from the database.')
-            return users
+            return users, next_cursor
         except Exception as e:
             self.logger.error(f'Error fetching all users from the database: {e}')
             return jsonify({'error': str(e)}), 500
 
     def create_user(self, new_user):
         try:
-            last_user = self.db_conn.db.users.find_one(sort=[('_id', -1)])
-            next_id = (last_user['_id'] + 1 if last_user else 1)
+            next_id = self.sequence_service.next_id('users')
             new_user['_id'] = next_id
             self.db_conn.db.users.insert_one(new_user)
             self.logger.info(f'New user created with ID: {next_id}')
-            return new_user
+            # The stored password is never sent back
+            return {key: value for key, value in new_user.items() if key != 'password'}
+        except DuplicateKeyError:
+            # The username_unique index rejects a taken username
+            return USERNAME_TAKEN
         except Exception as e:
             self.logger.error(f'Error creating the user: {e}')
             return jsonify({'error': str(e)}), 500
@@ -36,14 +44,18 @@ class UserService:
 
     def update_user(self, user_id, updates):
         try:
-            user = self.get_user_by_id(user_id)
+            user = self.db_conn.db.users.find_one_and_update(
+                {'_id': int(user_id)}, {'$set': updates}, projection={'password': 0},
+                return_document=ReturnDocument.AFTER
+            )
             if user:
-                self.db_conn.db.users.update_one({'_id': int(user_id)}, {'$set': updates})
                 self.logger.info(f'User with ID {user_id} updated successfully.')
-                return self.get_user_by_id(user_id)
+                return user
             else:
                 self.logger.warning(f'User ID {user_id} not found for update.')
                 return None
+        except DuplicateKeyError:
+            return USERNAME_TAKEN
         except Exception as e:
             self.logger.error(f'Error updating user ID {user_id}: {e}')
             return jsonify({'error': str(e)}), 500
@@ -0,0 +1,175 @@
+import itertools
+import os
+import sys
+import threading
+from types import SimpleNamespace
+import mongomock
+import pytest
+from pymongo import ReplaceOne
+
+# The app imports its packages from the maikaAPI directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database_model
+from models.database_model import DatabaseModel
+
+
+# Wire command sent by each collection method, mongomock publishes no command events
+COMMANDS = {
+    'insert_one': 'insert',
+    'insert_many': 'insert',
+    'update_one': 'update',
+    'update_many': 'update',
+    'replace_one': 'update',
+    'bulk_write': 'update',
+    'delete_one': 'delete',
+    'delete_many': 'delete',
+    'find_one_and_update': 'findAndModify',
+    'find_one_and_delete': 'findAndModify',
+    'find_one_and_replace': 'findAndModify',
+    'find': 'find',
+    'find_one': 'find',
+    'count_documents': 'aggregate',
+    'aggregate': 'aggregate',
+    'distinct': 'distinct'
+}
+_request_ids = itertools.count(1)
+
+
+# mongomock runs each operation as several Python steps, the server runs it atomically.
+# Holding a lock per collection during a call gives the tests the server's guarantee.
+# Each call is also reported to the command monitor as the command the driver would send
+class LockedCollection:
+    def __init__(self, collection, lock, monitor):
+        self._collection = collection
+        self._lock = lock
+        self._monitor = monitor
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name == 'bulk_write':
+            attribute = self._bulk_write
+        elif not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            command_name = COMMANDS.get(name)
+            if command_name and self._monitor is not None:
+                request_id = next(_request_ids)
+                self._monitor.started(SimpleNamespace(
+                    command_name=command_name, command={command_name: self._collection.name}, request_id=request_id
+                ))
+                self._monitor.succeeded(SimpleNamespace(
+                    command_name=command_name, request_id=request_id, duration_micros=0, reply={'ok': 1}
+                ))
+            with self._lock:
+                return attribute(*args, **kwargs)
+        return call
+
+    # mongomock's bulk_write fails on the write models of current pymongo, each request is run on its own
+    def _bulk_write(self, requests, ordered=True):
+        matched = modified = upserted = 0
+        for operation in requests:
+            if isinstance(operation, ReplaceOne):
+                result = self._collection.replace_one(operation._filter, operation._doc, upsert=bool(operation._upsert))
+            else:
+                result = self._collection.update_one(operation._filter, operation._doc, upsert=bool(operation._upsert))
+            matched += result.matched_count
+            modified += result.modified_count
+            upserted += result.upserted_id is not None
+        return SimpleNamespace(matched_count=matched, modified_count=modified, upserted_count=upserted)
+
+
+class LockedDatabase:
+    def __init__(self, database, monitor):
+        self._database = database
+        self._monitor = monitor
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._locks_lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        return LockedCollection(self._database[name], lock, self._monitor)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._database, name)
+        if isinstance(attribute, mongomock.Collection):
+            return self[name]
+        return attribute
+
+
+class LockedClient:
+    def __init__(self, client, monitor=None):
+        self._client = client
+        self._monitor = monitor
+        self._databases = {}
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = LockedDatabase(self._client[name], self._monitor)
+        return self._databases[name]
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# Database model backed by an in-memory client, shared by every service of a test
+@pytest.fixture
+def db_conn(monkeypatch):
+    model = DatabaseModel('maika_test')
+    monkeypatch.setattr(database_model, '_client', LockedClient(mongomock.MongoClient(tz_aware=True), model.command_monitor))
+    monkeypatch.setattr(database_model, '_client_pid', os.getpid())
+    return model
+
+
+# App with the API blueprints wired to the in-memory database, as app.py wires them
+@pytest.fixture
+def client(db_conn):
+    from flask import Flask
+    from schemas.json_provider import FastJSONProvider
+    from schemas.inventory_schema import InventorySchema
+    from schemas.menu_schemas import MenuSchema
+    from schemas.order_schemas import OrderSchema
+    from schemas.payment_schemas import PaymentSchema
+    from schemas.reservation_schemas import ReservationSchema
+    from schemas.staff_schema import StaffSchema
+    from schemas.user_schema import UserSchema
+    from routes.inventory_routes import InventoryRoutes
+    from routes.menu_routes import MenuRoutes
+    from routes.order_route import OrderRoutes
+    from routes.payment_route import PaymentRoutes
+    from routes.reservation_routes import ReservationRoute
+    from routes.staff_routes import StaffRoutes
+    from routes.user_routes import UserRoutes
+    from services.idempotency_service import IdempotencyService
+    from services.image_service import ImageService
+    from services.inventory_service import InventoryService
+    from services.menu_services import MenuService
+    from services.order_feed import OrderFeed
+    from services.order_service import OrderService
+    from services.payment_services import PaymentService
+    from services.reservation_service import ReservationService
+    from services.sequence_service import SequenceService
+    from services.slot_service import ReservationSlotService
+    from services.staff_service import StaffService
+    from services.user_service import UserService
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    sequence_service = SequenceService(db_conn)
+    image_service = ImageService(db_conn)
+    idempotency_service = IdempotencyService(db_conn)
+
+    app.register_blueprint(UserRoutes(UserService(db_conn, sequence_service), UserSchema()))
+    app.register_blueprint(ReservationRoute(
+        ReservationService(db_conn, sequence_service, ReservationSlotService(db_conn)), ReservationSchema()
+    ))
+    app.register_blueprint(StaffRoutes(StaffService(db_conn, sequence_service, image_service), StaffSchema()))
+    app.register_blueprint(InventoryRoutes(InventoryService(db_conn, sequence_service, image_service), InventorySchema()))
+    app.register_blueprint(MenuRoutes(MenuService(db_conn, sequence_service, image_service), MenuSchema()))
+    app.register_blueprint(PaymentRoutes(PaymentService(db_conn, sequence_service), PaymentSchema(), idempotency_service))
+    app.register_blueprint(OrderRoutes(
+        OrderService(db_conn, sequence_service), OrderSchema(), OrderFeed(db_conn), idempotency_service
+    ))
+    return app.test_client()
@@ -0,0 +1,17 @@
+ORDER = {'name': 'Ana', 'table': 4, 'dishes': [{'name': 'Tacos', 'price': 90, 'quantity': 2}]}
+
+
+def test_bulk_creates_the_orders(db_conn, client):
+    response = client.post('/api/v1/orders/bulk', json=[ORDER] * 3)
+
+    assert response.status_code == 201
+    assert len(response.get_json()['created']) == 3
+    assert db_conn.db.orders.count_documents({}) == 3
+
+
+def test_bulk_above_the_cap_is_rejected_before_any_write(db_conn, client):
+    response = client.post('/api/v1/orders/bulk', json=[ORDER] * 501)
+
+    assert response.status_code == 413
+    assert 'at most 500' in response.get_json()['error']
+    assert db_conn.db.orders.count_documents({}) == 0
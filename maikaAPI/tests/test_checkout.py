@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from services.payment_services import PaymentService
+from services.sequence_service import SequenceService
+
+ORDER = {'_id': 1, 'name': 'Ana', 'table': 4, 'status': 'pending', 'dishes': [{'name': 'Tacos', 'price': 90, 'quantity': 2}]}
+
+
+@pytest.fixture
+def service(db_conn):
+    payment_service = PaymentService(db_conn, SequenceService(db_conn))
+    # A standalone server, checkouts claim the order
+    payment_service.transactions = False
+    return payment_service
+
+
+def payment(total=180):
+    return {'rfc': 'XAXX010101000', 'payment_type': 'cash', 'order_id': 1, 'total': total}
+
+
+def test_checkout_stores_the_payment_and_removes_the_order(db_conn, service):
+    db_conn.db.orders.insert_one(dict(ORDER))
+
+    created = service.add_payment(payment())
+
+    assert created['total'] == 180
+    assert db_conn.db.orders.find_one({'_id': 1}) is None
+    assert db_conn.db.tombstones.find_one({'collection': 'orders', 'document_id': 1})
+
+
+def test_wrong_total_leaves_the_order_pending(db_conn, service):
+    db_conn.db.orders.insert_one(dict(ORDER))
+
+    assert service.add_payment(payment(100)) == 'The total does not match the order, expected 180'
+    order = db_conn.db.orders.find_one({'_id': 1})
+    assert order['status'] == 'pending'
+    assert 'paying_at' not in order
+    assert service.add_payment(payment())['total'] == 180
+
+
+def test_order_being_paid_is_a_conflict(db_conn, service):
+    db_conn.db.orders.insert_one({**ORDER, 'status': 'paying', 'payment_id': 7, 'paying_at': datetime.now(timezone.utc)})
+
+    assert service.add_payment(payment()) == 'The order is already being paid'
+
+
+def test_abandoned_claim_with_a_wrong_total_can_still_be_paid(db_conn, service):
+    abandoned_at = datetime.now(timezone.utc) - timedelta(seconds=service.claim_timeout + 1)
+    db_conn.db.orders.insert_one({**ORDER, 'status': 'paying', 'payment_id': 7, 'paying_at': abandoned_at})
+
+    assert service.add_payment(payment(100)).startswith('The total does not match')
+    assert db_conn.db.orders.find_one({'_id': 1})['status'] == 'pending'
+
+    created = service.add_payment(payment())
+    assert created['order_id'] == 1
+    assert db_conn.db.orders.find_one({'_id': 1}) is None
+
+
+def test_abandoned_claim_with_its_payment_stored_is_finished(db_conn, service):
+    abandoned_at = datetime.now(timezone.utc) - timedelta(seconds=service.claim_timeout + 1)
+    db_conn.db.orders.insert_one({**ORDER, 'status': 'paying', 'payment_id': 7, 'paying_at': abandoned_at})
+    db_conn.db.payments.insert_one({'_id': 7, 'order_id': 1, 'total': 180, 'active': True})
+
+    assert service.add_payment(payment())['_id'] == 7
+    assert db_conn.db.orders.find_one({'_id': 1}) is None
+    assert db_conn.db.payments.count_documents({}) == 1
+
+
+def test_missing_order(db_conn, service):
+    assert service.add_payment(payment()) == 'Order not found'
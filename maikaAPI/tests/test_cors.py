@@ -0,0 +1,24 @@
+import importlib
+import pytest
+
+
+@pytest.fixture
+def app_client(monkeypatch):
+    for name, value in {'MONGODB_USER': 'maika', 'MONGODB_PASS': 'maika', 'MONGODB_HOST': 'localhost'}.items():
+        monkeypatch.setenv(name, value)
+    return importlib.import_module('app').app.test_client()
+
+
+@pytest.mark.parametrize('url', ['/api/v1/orders', '/api/v1/payments', '/api/v1/inventories'])
+def test_preflight_allows_the_idempotency_key(app_client, url):
+    response = app_client.options(url, headers={
+        'Origin': 'http://localhost:3000',
+        'Access-Control-Request-Method': 'POST',
+        'Access-Control-Request-Headers': 'content-type,idempotency-key'
+    })
+
+    assert response.status_code == 200
+    assert response.headers['Access-Control-Allow-Origin'] == 'http://localhost:3000'
+    allowed = {header.strip().lower() for header in response.headers['Access-Control-Allow-Headers'].split(',')}
+    assert {'content-type', 'idempotency-key'} <= allowed
+    assert response.headers['Access-Control-Allow-Credentials'] == 'true'
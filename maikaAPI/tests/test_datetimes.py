@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+ORDER = {'name': 'Ana', 'table': 4, 'dishes': [{'name': 'Tacos', 'price': 90, 'quantity': 2}]}
+RESERVATION = {
+    'date': '21 Nov 2024 14:00', 'people': 2, 't_reservation': 'Dinner', 'name': 'Ana', 'last_name': 'Diaz',
+    'phone': '5512345678', 'email': 'ana@example.com'
+}
+
+
+def test_stamps_read_back_in_utc_like_they_were_written(client):
+    created = client.post('/api/v1/orders', json=ORDER).get_json()
+    listed = client.get('/api/v1/orders').get_json()[0]
+
+    for order in (created, listed):
+        for field in ('created_at', 'updated_at'):
+            assert datetime.fromisoformat(order[field]).utcoffset() == timezone.utc.utcoffset(None)
+    # BSON keeps milliseconds
+    assert abs(datetime.fromisoformat(created['created_at']) - datetime.fromisoformat(listed['created_at'])).total_seconds() < 0.001
+
+
+def test_reservation_time_stays_local(client):
+    created = client.post('/api/v1/reservations', json=RESERVATION).get_json()
+    listed = client.get('/api/v1/reservations').get_json()[0]
+
+    assert created['date_at'] == listed['date_at'] == '2024-11-21T14:00:00'
+    assert datetime.fromisoformat(listed['updated_at']).tzinfo is not None
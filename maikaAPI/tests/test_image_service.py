@@ -0,0 +1,59 @@
+import base64
+import hashlib
+import pytest
+from gridfs.errors import NoFile
+from pymongo.errors import DuplicateKeyError
+from services.image_service import ImageService
+
+DATA = b'\x89PNG image bytes' * 10
+DATA_URI = 'data:image/png;base64,' + base64.b64encode(DATA).decode()
+IMAGE_HASH = hashlib.sha256(DATA).hexdigest()
+CHUNK_SIZE = 64
+
+
+# GridFS does not run on mongomock, this bucket writes the same documents in the same order:
+# the chunks first, each one unique by (files_id, n), then the file document
+class Bucket:
+    def __init__(self, db):
+        self.files = db['images.files']
+        self.chunks = db['images.chunks']
+
+    def upload_from_stream_with_id(self, file_id, filename, data, metadata=None):
+        for n, start in enumerate(range(0, len(data), CHUNK_SIZE)):
+            if self.chunks.find_one({'files_id': file_id, 'n': n}):
+                raise DuplicateKeyError('duplicate chunk')
+            self.chunks.insert_one({'files_id': file_id, 'n': n, 'data': data[start:start + CHUNK_SIZE]})
+        if self.files.find_one({'_id': file_id}):
+            raise DuplicateKeyError('duplicate file')
+        self.files.insert_one({'_id': file_id, 'length': len(data), 'chunkSize': CHUNK_SIZE, 'metadata': metadata})
+
+    def delete(self, file_id):
+        deleted = self.files.delete_one({'_id': file_id}).deleted_count
+        self.chunks.delete_many({'files_id': file_id})
+        if not deleted:
+            raise NoFile(file_id)
+
+
+@pytest.fixture
+def service(db_conn, monkeypatch):
+    monkeypatch.setattr(ImageService, 'bucket', property(lambda service: Bucket(service.db_conn.db)))
+    return ImageService(db_conn)
+
+
+def test_upload_replaces_the_chunks_of_a_failed_upload(db_conn, service):
+    # An upload that crashed after its first chunk, before the file document
+    db_conn.db['images.chunks'].insert_one({'files_id': IMAGE_HASH, 'n': 0, 'data': DATA[:CHUNK_SIZE]})
+
+    assert service.store_image(DATA_URI) == f'/api/v1/images/{IMAGE_HASH}'
+    assert service.image_complete(IMAGE_HASH)
+
+
+def test_upload_that_loses_the_race_keeps_the_stored_image(db_conn, service, monkeypatch):
+    Bucket(db_conn.db).upload_from_stream_with_id(IMAGE_HASH, IMAGE_HASH, DATA)
+    chunks = list(db_conn.db['images.chunks'].find())
+
+    # The other upload finished between the existence check and this upload
+    monkeypatch.setattr(service, 'image_exists', lambda image_hash: False)
+
+    assert service.store_image(DATA_URI) == f'/api/v1/images/{IMAGE_HASH}'
+    assert list(db_conn.db['images.chunks'].find()) == chunks
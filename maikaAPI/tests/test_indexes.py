@@ -0,0 +1,45 @@
+from pymongo.errors import ServerSelectionTimeoutError
+from models.indexes import INDEXES
+
+USER = {'username': 'luis', 'password': 'secret1', 'name': 'Luis', 'userType': 'kitchen'}
+
+
+def test_duplicate_username_is_a_conflict(db_conn, client):
+    db_conn.ensure_indexes()
+
+    assert client.post('/api/v1/users', json=USER).status_code == 201
+    response = client.post('/api/v1/users', json=USER)
+
+    assert response.status_code == 409
+    assert response.get_json() == {'error': 'Username already exists'}
+
+
+def test_renaming_to_a_taken_username_is_a_conflict(db_conn, client):
+    db_conn.ensure_indexes()
+    client.post('/api/v1/users', json=USER)
+    client.post('/api/v1/users', json={**USER, 'username': 'ana'})
+
+    response = client.put('/api/v1/users/2', json={'username': 'luis'})
+
+    assert response.status_code == 409
+
+
+def test_unreachable_server_stops_after_the_first_collection(db_conn, monkeypatch):
+    attempts = []
+
+    class UnreachableCollection:
+        def __init__(self, name):
+            self.name = name
+
+        def create_indexes(self, models):
+            attempts.append(self.name)
+            raise ServerSelectionTimeoutError('No servers found yet')
+
+    class UnreachableDatabase:
+        def __getitem__(self, name):
+            return UnreachableCollection(name)
+
+    monkeypatch.setattr(type(db_conn), 'db', property(lambda self: UnreachableDatabase()))
+
+    assert db_conn.ensure_indexes() == {}
+    assert attempts == [next(iter(INDEXES))]
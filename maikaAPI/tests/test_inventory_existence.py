@@ -0,0 +1,53 @@
+import mongomock
+import pytest
+
+INVENTORIES = [
+    {'_id': 1, 'name': 'Tomato', 'unit': 'kg', 'existence': 10},
+    {'_id': 2, 'name': 'Onion', 'unit': 'kg', 'existence': 2},
+    {'_id': 3, 'name': 'Rice', 'unit': 'kg', 'existence': 5},
+]
+
+
+@pytest.fixture
+def inventories(db_conn):
+    db_conn.db.inventories.insert_many([dict(inventory) for inventory in INVENTORIES])
+    return db_conn.db.inventories
+
+
+def existence(inventories, inventory_id):
+    return inventories.find_one({'_id': inventory_id})['existence']
+
+
+def test_batch_applies_the_covered_deltas_and_rejects_the_rest(client, inventories):
+    response = client.put('/api/v1/inventories/existence', json=[
+        {'id': 1, 'delta': -4}, {'id': 2, 'delta': -3}, {'id': 3, 'existence': 8}, {'id': 9, 'delta': 1}
+    ])
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert [inventory['_id'] for inventory in body['updated']] == [1, 3]
+    assert body['rejected'] == [2]
+    assert body['missing'] == [9]
+    assert existence(inventories, 1) == 6
+    assert existence(inventories, 2) == 2
+    assert existence(inventories, 3) == 8
+
+
+def test_applied_delta_is_not_rejected_when_another_write_follows(client, inventories, monkeypatch):
+    find = mongomock.Collection.find
+    consumed = []
+
+    # Another consume writes the inventory between the batch and its read back
+    def find_after_write(self, *args, **kwargs):
+        if self.name == 'inventories' and not consumed:
+            consumed.append(True)
+            self.update_one({'_id': 1}, {'$inc': {'existence': -1}, '$currentDate': {'updated_at': True}})
+        return find(self, *args, **kwargs)
+    monkeypatch.setattr(mongomock.Collection, 'find', find_after_write)
+
+    response = client.put('/api/v1/inventories/existence', json=[{'id': 1, 'delta': -4}, {'id': 2, 'delta': -3}])
+
+    body = response.get_json()
+    assert [inventory['_id'] for inventory in body['updated']] == [1]
+    assert body['rejected'] == [2]
+    assert existence(inventories, 1) == 5
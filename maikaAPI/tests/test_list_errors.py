@@ -0,0 +1,23 @@
+import pytest
+from models.database_model import DatabaseModel
+
+
+# A failed page read answers with the error of the service, not with a serialization error
+@pytest.mark.parametrize('url', [
+    '/api/v1/orders?limit=10',
+    '/api/v1/inventories?limit=10',
+    '/api/v1/reservations?limit=10',
+    '/api/v1/payments?limit=10',
+    '/api/v1/staff?limit=10',
+    '/api/v1/users?limit=10',
+    '/menu-api/v1/menus?limit=10',
+])
+def test_list_returns_the_service_error(client, monkeypatch, url):
+    def fail(*args, **kwargs):
+        raise RuntimeError('Database down')
+    monkeypatch.setattr(DatabaseModel, 'find_page', fail)
+
+    response = client.get(url)
+
+    assert response.status_code == 500
+    assert 'Database down' in response.get_json()['error']
@@ -0,0 +1,61 @@
+import queue
+import threading
+import pytest
+from services.order_feed import OrderFeed
+from services.order_service import OrderService
+
+
+def test_stalled_display_does_not_block_the_others(db_conn):
+    feed = OrderFeed(db_conn)
+    feed.queue_size = 2
+    stalled = queue.Queue(maxsize=feed.queue_size)
+    listening = queue.Queue(maxsize=100)
+    feed.subscribers.update({stalled, listening})
+
+    # Nobody reads the stalled queue, as with a display behind a dead connection
+    publisher = threading.Thread(target=lambda: [feed.publish({'type': 'delete', '_id': index}) for index in range(5)])
+    publisher.start()
+    publisher.join(timeout=2)
+
+    assert not publisher.is_alive()
+    assert feed.subscribers == {listening}
+    assert listening.qsize() == 5
+    # The stalled display only finds the reset marker, it reconnects for a fresh snapshot
+    assert stalled.get_nowait() is None
+    assert stalled.empty()
+
+
+@pytest.fixture
+def subscriptions(monkeypatch):
+    subscribers = set()
+
+    def subscribe(feed):
+        subscriber = queue.Queue()
+        subscribers.add(subscriber)
+        return subscriber
+    monkeypatch.setattr(OrderFeed, 'subscribe', subscribe)
+    monkeypatch.setattr(OrderFeed, 'unsubscribe', lambda feed, subscriber: subscribers.discard(subscriber))
+    return subscribers
+
+
+def test_display_that_leaves_before_the_first_event_is_unsubscribed(client, subscriptions):
+    app = client.application
+    with app.test_request_context('/api/v1/orders/stream'):
+        response = app.view_functions['order.stream_orders']()
+    assert len(subscriptions) == 1
+
+    # The server closes the response without sending anything, the client is gone
+    response.close()
+
+    assert not subscriptions
+
+
+def test_stream_returns_the_snapshot_error(client, subscriptions, monkeypatch):
+    from flask import jsonify
+    monkeypatch.setattr(OrderService, 'get_all_orders', lambda service: (jsonify({'error': 'Database down'}), 500))
+
+    response = client.get('/api/v1/orders/stream')
+
+    assert response.status_code == 500
+    assert response.get_json() == {'error': 'Database down'}
+    assert not subscriptions
@@ -0,0 +1,85 @@
+from datetime import datetime
+import pytest
+
+IMAGE_HASH = 'a' * 64
+IMAGE_PATH = f'/api/v1/images/{IMAGE_HASH}'
+
+ORDER = {'_id': 1, 'name': 'Ana', 'table': 4, 'status': 'pending', 'dishes': [{'name': 'Tacos', 'price': 90, 'quantity': 2}]}
+INVENTORY = {'_id': 1, 'name': 'Tomato', 'unit': 'kg', 'existence': 10, 'image': IMAGE_PATH}
+RESERVATION = {
+    '_id': 1, 'date': '21 Nov 2024 14:00', 'date_at': datetime(2024, 11, 21, 14, 0), 'people': 2,
+    't_reservation': 'Dinner', 'name': 'Ana', 'last_name': 'Diaz', 'phone': '5512345678', 'email': 'ana@example.com'
+}
+EMPLOYEE = {
+    '_id': 1, 'name': 'Luis', 'title': 'Chef', 'email': 'luis@example.com', 'salary': 1000,
+    'birthday': '1990-01-01', 'status': True, 'avatar': IMAGE_PATH
+}
+USER = {'_id': 1, 'username': 'luis', 'password': 'secret1', 'name': 'Luis', 'userType': 'kitchen'}
+PAYMENT = {'_id': 1, 'rfc': 'XAXX010101000', 'payment_type': 'cash', 'order_id': 1, 'total': 180, 'active': True}
+
+
+def seed(db_conn):
+    db_conn.db['images.files'].insert_one({'_id': IMAGE_HASH})
+    db_conn.db.orders.insert_one(dict(ORDER))
+    db_conn.db.inventories.insert_one(dict(INVENTORY))
+    db_conn.db.reservations.insert_one(dict(RESERVATION))
+    db_conn.db.staff.insert_one(dict(EMPLOYEE))
+    db_conn.db.users.insert_one(dict(USER))
+    db_conn.db.payments.insert_one(dict(PAYMENT))
+
+
+# Each mutation is one round trip on its collection, deletes add the tombstone read by ?since= clients
+# and the image or avatar of an update is looked up in the image store
+@pytest.mark.parametrize('method, url, body, commands', [
+    ('put', '/api/v1/orders/1', {'name': 'Ana', 'table': 5, 'dishes': ORDER['dishes']},
+     [('findAndModify', 'orders')]),
+    ('delete', '/api/v1/orders/1', None,
+     [('findAndModify', 'orders'), ('insert', 'tombstones')]),
+    ('put', '/api/v1/inventories/1', {'name': 'Tomato', 'unit': 'kg', 'existence': 12, 'image': IMAGE_PATH},
+     [('find', 'images.files'), ('findAndModify', 'inventories')]),
+    ('put', '/api/v1/inventories/existence/1', {'existence': 3},
+     [('findAndModify', 'inventories')]),
+    ('delete', '/api/v1/inventories/1', None,
+     [('findAndModify', 'inventories'), ('insert', 'tombstones')]),
+    ('put', '/api/v1/reservations/1', {**{key: value for key, value in RESERVATION.items() if key not in ('_id', 'date_at')}, 'special': 'Window'},
+     [('findAndModify', 'reservations')]),
+    ('delete', '/api/v1/reservations/1', None,
+     [('findAndModify', 'reservations'), ('update', 'reservation_slots'), ('insert', 'tombstones')]),
+    ('put', '/api/v1/staff/1', {**{key: value for key, value in EMPLOYEE.items() if key != '_id'}, 'title': 'Sous chef'},
+     [('find', 'images.files'), ('findAndModify', 'staff')]),
+    ('delete', '/api/v1/staff/1', None,
+     [('findAndModify', 'staff')]),
+    ('put', '/api/v1/users/1', {'name': 'Luis Perez'},
+     [('findAndModify', 'users')]),
+    ('delete', '/api/v1/users/1', None,
+     [('delete', 'users')]),
+    ('delete', '/api/v1/payments/1', None,
+     [('findAndModify', 'payments')]),
+])
+def test_mutation_commands(db_conn, client, method, url, body, commands):
+    seed(db_conn)
+
+    with db_conn.command_monitor.assert_max_queries(len(commands)) as recorder:
+        response = getattr(client, method)(url, json=body)
+
+    assert response.status_code == 200, response.get_json()
+    assert [(command['command'], command['collection']) for command in recorder.commands] == commands
+
+
+@pytest.mark.parametrize('method, url, body', [
+    ('put', '/api/v1/orders/9', {'name': 'Ana', 'table': 5, 'dishes': ORDER['dishes']}),
+    ('delete', '/api/v1/orders/9', None),
+    ('put', '/api/v1/inventories/existence/9', {'existence': 3}),
+    ('delete', '/api/v1/inventories/9', None),
+    ('delete', '/api/v1/reservations/9', None),
+    ('delete', '/api/v1/staff/9', None),
+    ('put', '/api/v1/users/9', {'name': 'Luis Perez'}),
+    ('delete', '/api/v1/payments/9', None),
+])
+def test_missing_document_is_one_command(db_conn, client, method, url, body):
+    seed(db_conn)
+
+    with db_conn.command_monitor.assert_max_queries(1):
+        response = getattr(client, method)(url, json=body)
+
+    assert response.status_code == 404
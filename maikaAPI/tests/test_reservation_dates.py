@@ -0,0 +1,47 @@
+from datetime import datetime
+import pytest
+
+RESERVATION = {'people': 2, 't_reservation': 'Dinner', 'name': 'Ana', 'last_name': 'Diaz', 'phone': 5512345678}
+
+
+def seed(db_conn):
+    # Stored out of chronological order on purpose
+    for reservation_id, day, hour in [(1, 3, 20), (2, 1, 14), (3, 2, 13), (4, 1, 13), (5, 9, 14), (6, 2, 13)]:
+        db_conn.db.reservations.insert_one({**RESERVATION, '_id': reservation_id, 'date_at': datetime(2024, 11, day, hour)})
+
+
+def test_range_is_chronological(db_conn, client):
+    seed(db_conn)
+
+    response = client.get('/api/v1/reservations?from=2024-11-01&to=2024-11-04')
+
+    assert response.status_code == 200
+    assert [reservation['_id'] for reservation in response.get_json()] == [4, 2, 3, 6, 1]
+
+
+def test_range_pages_follow_the_date_order(db_conn, client):
+    seed(db_conn)
+
+    ids = []
+    after = None
+    while True:
+        query = {'from': '2024-11-01', 'to': '2024-11-10', 'limit': 2}
+        if after:
+            query['after'] = after
+        page = client.get('/api/v1/reservations', query_string=query).get_json()
+        ids.extend(reservation['_id'] for reservation in page['items'])
+        after = page['next']
+        if after is None:
+            break
+
+    assert ids == [4, 2, 3, 6, 1, 5]
+
+
+@pytest.mark.parametrize('query', [
+    'from=2024-01-01T00:00:00%2B02:00&to=2024-02-01',
+    'from=2024-01-01&to=2024-02-01T00:00:00Z',
+])
+def test_bounds_with_an_offset_are_rejected(db_conn, client, query):
+    response = client.get(f'/api/v1/reservations?{query}')
+
+    assert response.status_code == 400
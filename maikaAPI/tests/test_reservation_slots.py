@@ -0,0 +1,126 @@
+from datetime import datetime
+import pytest
+from services.reservation_service import ReservationService
+from services.sequence_service import SequenceService
+from services.slot_service import ReservationSlotService
+
+LUNCH = datetime(2024, 11, 21, 14, 0)
+DINNER = datetime(2024, 11, 21, 20, 0)
+
+
+@pytest.fixture
+def service(db_conn):
+    slot_service = ReservationSlotService(db_conn)
+    slot_service.covers = 4
+    return ReservationService(db_conn, SequenceService(db_conn), slot_service)
+
+
+def reservation(date_at, people, **fields):
+    return {'date': date_at.strftime('%d %b %Y %H:%M'), 'date_at': date_at, 'people': people, 'name': 'Ana', **fields}
+
+
+def remaining(service, date_at):
+    return service.slot_service.availability(date_at.date())['slots'][
+        service.slot_service.day_slots().index(date_at.strftime('%H:%M'))
+    ]['remaining']
+
+
+def test_edit_without_moving_is_one_command(db_conn, service):
+    created = service.add_reservation(reservation(LUNCH, 4))
+
+    with db_conn.command_monitor.assert_max_queries(1):
+        updated = service.update_reservation(created['_id'], reservation(LUNCH, 4, name='Ana Maria'))
+
+    # The reservation keeps its covers even though the slot is full
+    assert updated['name'] == 'Ana Maria'
+    assert remaining(service, LUNCH) == 0
+
+
+def test_move_takes_the_new_covers_and_gives_back_the_old(service):
+    created = service.add_reservation(reservation(LUNCH, 3))
+
+    updated = service.update_reservation(created['_id'], reservation(DINNER, 2))
+
+    assert updated['date_at'] == DINNER
+    assert remaining(service, LUNCH) == 4
+    assert remaining(service, DINNER) == 2
+
+
+def test_move_to_a_full_slot_keeps_the_reservation(service):
+    created = service.add_reservation(reservation(LUNCH, 2))
+    service.add_reservation(reservation(DINNER, 3))
+
+    assert service.update_reservation(created['_id'], reservation(DINNER, 2)) == 'No availability'
+    assert remaining(service, LUNCH) == 2
+    assert remaining(service, DINNER) == 1
+    assert service.get_reservation_by_id(created['_id'])['date_at'] == LUNCH
+
+
+def test_moving_a_deleted_reservation_gives_back_the_new_covers(service):
+    created = service.add_reservation(reservation(LUNCH, 2))
+    service.delete_reservation(created['_id'])
+
+    assert service.update_reservation(created['_id'], reservation(DINNER, 2)) is None
+    assert remaining(service, LUNCH) == 4
+    assert remaining(service, DINNER) == 4
+
+
+def test_first_booking_of_a_day_that_loses_the_race_still_books(service, monkeypatch):
+    ensure_day = service.slot_service.ensure_day
+
+    # A concurrent first booking creates the day between the missed update and the upsert
+    def lose_race(day):
+        ensure_day(day)
+        return ensure_day(day)
+    monkeypatch.setattr(service.slot_service, 'ensure_day', lose_race)
+
+    assert service.slot_service.book(LUNCH, 2)
+    assert remaining(service, LUNCH) == 2
+
+
+def test_fewer_people_in_a_full_slot_gives_back_the_difference(service):
+    created = service.add_reservation(reservation(LUNCH, 4))
+
+    updated = service.update_reservation(created['_id'], reservation(LUNCH, 2))
+
+    assert updated['people'] == 2
+    assert remaining(service, LUNCH) == 2
+
+
+def test_small_move_in_a_full_slot_only_takes_the_new_slots(service):
+    created = service.add_reservation(reservation(LUNCH, 4))
+    later = LUNCH.replace(minute=15)
+
+    updated = service.update_reservation(created['_id'], reservation(later, 4))
+
+    assert updated['date_at'] == later
+    assert remaining(service, LUNCH) == 4
+    assert remaining(service, later) == 0
+
+
+def test_more_people_than_the_slot_has_left_keeps_the_reservation(service):
+    created = service.add_reservation(reservation(LUNCH, 3))
+
+    assert service.update_reservation(created['_id'], reservation(LUNCH, 5)) == 'No availability'
+    assert remaining(service, LUNCH) == 1
+    assert service.get_reservation_by_id(created['_id'])['people'] == 3
+
+
+def test_move_retries_when_the_reservation_changed_meanwhile(db_conn, service, monkeypatch):
+    created = service.add_reservation(reservation(LUNCH, 2))
+    move = service.slot_service.move
+    calls = []
+
+    # Another edit moves the reservation to dinner after its covers were read
+    def concurrent_edit(*args, **kwargs):
+        if not calls:
+            calls.append(args)
+            service.update_reservation(created['_id'], reservation(DINNER, 2))
+        return move(*args, **kwargs)
+    monkeypatch.setattr(service.slot_service, 'move', concurrent_edit)
+
+    updated = service.update_reservation(created['_id'], reservation(LUNCH, 3))
+
+    assert updated['people'] == 3
+    assert remaining(service, LUNCH) == 1
+    assert remaining(service, DINNER) == 4
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from services.sequence_service import SequenceService
+
+CREATES = 5000
+THREADS = 32
+
+
+def reserve_in_parallel(services, count=1):
+    # Each create takes its ids from one of the services, as the workers of a deployment would
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        batches = executor.map(lambda index: services[index % len(services)].reserve_ids('orders', count), range(CREATES))
+        return [order_id for batch in batches for order_id in batch]
+
+
+@pytest.mark.parametrize('block_size', [1, 50])
+def test_parallel_creates_get_unique_ids(db_conn, block_size):
+    services = [SequenceService(db_conn, block_size=block_size) for _ in range(4)]
+
+    ids = reserve_in_parallel(services)
+
+    assert len(ids) == CREATES
+    assert len(set(ids)) == CREATES
+    assert min(ids) >= 1
+
+
+@pytest.mark.parametrize('block_size', [1, 50])
+def test_parallel_batches_get_unique_ids(db_conn, block_size):
+    services = [SequenceService(db_conn, block_size=block_size) for _ in range(4)]
+
+    ids = reserve_in_parallel(services, count=3)
+
+    assert len(ids) == CREATES * 3
+    assert len(set(ids)) == CREATES * 3
+
+
+def test_single_mode_ids_are_consecutive(db_conn):
+    service = SequenceService(db_conn, block_size=1)
+
+    ids = reserve_in_parallel([service])
+
+    # Without leased blocks there are no gaps
+    assert sorted(ids) == list(range(1, CREATES + 1))
+
+
+def test_counter_starts_after_existing_documents(db_conn):
+    db_conn.db.orders.insert_many([{'_id': 7}, {'_id': 41}])
+
+    ids = reserve_in_parallel([SequenceService(db_conn, block_size=block_size) for block_size in (1, 20)])
+
+    assert min(ids) == 42
+    assert len(set(ids)) == CREATES